@@ -0,0 +1,31 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from financial_data.utils.cap_classification import build_ranking, universe
+from financial_data.utils.symbols import to_yfinance_symbol
+from financial_data.utils.ticker_metadata import get_ticker_metadata
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch market caps for the classification universe and store the cap-bucket ranking "
+        "every process loads (schedule daily)."
+    )
+
+    def handle(self, *args, **options):
+        yfinance_symbols = [to_yfinance_symbol(symbol) for symbol in universe()]
+        metadata = get_ticker_metadata(yfinance_symbols, deadline=len(yfinance_symbols) + 60)
+        failed = [symbol for symbol in yfinance_symbols if symbol not in metadata]
+        index, coverage, stored = build_ranking(metadata)
+
+        buckets = Counter(index.values())
+        # Below the coverage threshold the stored ranking (if any) is left as it is
+        source = "market caps and stored" if stored else "stocks_list, not stored"
+        self.stdout.write(
+            f"Cap index built from {source} ({coverage:.0%} of {len(yfinance_symbols)} symbols "
+            "have a market cap): "
+            + ", ".join(f"{bucket}: {count}" for bucket, count in sorted(buckets.items()))
+        )
+        if failed:
+            self.stderr.write(f"Metadata fetch failed for {len(failed)} symbols: {', '.join(failed[:20])}")
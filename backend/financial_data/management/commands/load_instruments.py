@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from financial_data.utils.instruments import refresh_instruments
+
+
+class Command(BaseCommand):
+    help = "Reload the instrument master from the Kite instruments dump (schedule daily, before the open)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", help="Load a local copy of the dump instead of fetching it from Kite")
+
+    def handle(self, *args, **options):
+        source = options["csv"] or settings.INSTRUMENTS_CSV or "Kite"
+        try:
+            count = refresh_instruments(options["csv"])
+        except Exception as e:
+            raise CommandError(f"Could not load instruments from {source}: {e}")
+        self.stdout.write(f"Loaded {count} instruments from {source}")
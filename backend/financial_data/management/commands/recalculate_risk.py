@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from financial_data.models import RiskProfile, ZerodhaUser
+from financial_data.utils.fetch_executor import fan_out
+from financial_data.utils.holdings_cache import get_holdings
+from financial_data.utils.kite_clients import get_kite_client
+from financial_data.utils.cap_classification import get_cap_index
+from financial_data.utils.risk_scoring import install_cap_index, score_profile
+from financial_data.utils.zerodha_session import is_token_expired
+
+
+def fetch_exposure(zerodha_user):
+    """(stock holdings {symbol: value}, MF value) for one linked account, the same way risk/calculate/ does"""
+    stock_holdings = {}
+    for holding in get_holdings(zerodha_user):
+        if holding['product'] == 'CNC':  # Only consider delivery holdings
+            stock_holdings[holding['tradingsymbol']] = holding['quantity'] * holding['last_price']
+    mf_holdings = get_kite_client(zerodha_user.access_token).mf_holdings()
+    total_mf_value = sum(mf_holding['quantity'] * mf_holding['average_price'] for mf_holding in mf_holdings)
+    return stock_holdings, total_mf_value
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate every stored risk profile, e.g. after changing cap classifications or scoring weights. "
+        "Zerodha profiles are rescored from freshly fetched holdings where the account is still linked, "
+        "otherwise from their stored exposure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Profiles loaded, scored and written per batch")
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Scoring worker processes (1 scores in this process)")
+        parser.add_argument("--fetch-workers", type=int, default=8, help="Concurrent Zerodha holdings fetches")
+        parser.add_argument("--stored-only", action="store_true",
+                            help="Rescore from stored exposure without fetching holdings from Zerodha")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        total = RiskProfile.objects.count()
+        stats = {"updated": 0, "refreshed": 0, "stored": 0, "fetch_failed": 0}
+        started = time.monotonic()
+        self.stdout.write(f"Recalculating {total} risk profiles in chunks of {chunk_size}")
+
+        # Workers get the current cap-bucket index once, not with every profile. They are
+        # spawned rather than forked: this process already runs background fetch threads.
+        cap_index = get_cap_index()
+        install_cap_index(cap_index)
+        executor = ProcessPoolExecutor(
+            max_workers=options["processes"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=install_cap_index,
+            initargs=(cap_index,),
+        ) if options["processes"] > 1 else None
+        try:
+            last_pk = 0
+            while True:
+                # Keyset pagination keeps each chunk an indexed range scan
+                profiles = list(RiskProfile.objects.filter(pk__gt=last_pk).order_by("pk")[:chunk_size])
+                if not profiles:
+                    break
+                last_pk = profiles[-1].pk
+                self._recalculate_chunk(profiles, executor, options, stats)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  {stats['updated']}/{total} profiles "
+                    f"({stats['updated'] / elapsed:.1f}/s, {elapsed:.1f}s elapsed)"
+                )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {stats['updated']} profiles in {elapsed:.1f}s "
+            f"({stats['updated'] / elapsed if elapsed else 0:.1f}/s): "
+            f"{stats['refreshed']} from fresh holdings, {stats['stored']} from stored exposure, "
+            f"{stats['fetch_failed']} holdings fetches failed"
+        ))
+
+    def _recalculate_chunk(self, profiles, executor, options, stats):
+        exposures = {}
+        if not options["stored_only"]:
+            zerodha_users = {
+                zerodha_user.user_id: zerodha_user
+                for zerodha_user in ZerodhaUser.objects.filter(
+                    user_id__in=[p.user_id for p in profiles if p.calculation_mode == 'zerodha']
+                )
+                if not is_token_expired(zerodha_user)
+            }
+            exposures, failed = fan_out(
+                lambda user_id: fetch_exposure(zerodha_users[user_id]),
+                list(zerodha_users),
+                max_workers=options["fetch_workers"],
+                # The whole chunk is bounded by its size, not the per-request deadline
+                deadline=len(zerodha_users) + 60,
+            )
+            stats["fetch_failed"] += len(failed)
+
+        inputs = []
+        for profile in profiles:
+            if profile.user_id in exposures:
+                stock_holdings, total_mf_value = exposures[profile.user_id]
+                profile.stock_exposure = stock_holdings
+                profile.mf_exposure = {'total_value': total_mf_value}
+                stats["refreshed"] += 1
+            else:
+                stats["stored"] += 1
+
+            fd_value = profile.fd_value or 0
+            mf_value = (profile.mf_exposure or {}).get('total_value', 0)
+            if profile.calculation_mode == 'manual':
+                inputs.append({
+                    "fd_value": fd_value, "mf_value": mf_value, "mode": "total",
+                    "total_stock_value": (profile.stock_exposure or {}).get('total_value', 0),
+                })
+            else:
+                inputs.append({
+                    "fd_value": fd_value, "holdings": profile.stock_exposure or {}, "mf_value": mf_value,
+                    "mode": "symbol",
+                })
+
+        if executor:
+            chunksize = max(1, len(inputs) // (options["processes"] * 4))
+            results = list(executor.map(score_profile, inputs, chunksize=chunksize))
+        else:
+            results = [score_profile(item) for item in inputs]
+
+        # bulk_update skips auto_now, so the timestamp is set explicitly
+        now = timezone.now()
+        for profile, (risk_score, risk_category) in zip(profiles, results):
+            profile.risk_score = risk_score
+            profile.risk_category = risk_category
+            profile.last_calculated = now
+        RiskProfile.objects.bulk_update(
+            profiles, ["risk_score", "risk_category", "stock_exposure", "mf_exposure", "last_calculated"]
+        )
+        stats["updated"] += len(profiles)
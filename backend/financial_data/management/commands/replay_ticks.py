@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from financial_data.utils.tick_replay import load_ticks, replay_factory
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded ticks over a local websocket in Kite's binary format. "
+        "Point KITE_TICKER_ROOT at ws://<host>:<port> to stream from it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("recording", help="JSON-lines file of ticks")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between frames")
+        parser.add_argument("--once", action="store_true", help="Stop after one pass instead of looping")
+
+    def handle(self, *args, **options):
+        from twisted.internet import reactor
+
+        try:
+            ticks = load_ticks(options["recording"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['recording']}: {e}")
+
+        url = f"ws://{options['host']}:{options['port']}"
+        factory = replay_factory(url, ticks, interval=options["interval"], loop=not options["once"])
+        reactor.listenTCP(options["port"], factory, interface=options["host"])
+        self.stdout.write(f"Replaying {len(ticks)} ticks on {url}")
+        reactor.run()
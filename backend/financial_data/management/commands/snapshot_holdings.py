@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financial_data.models import ZerodhaUser
+from financial_data.utils.holding_snapshots import record_snapshots
+from financial_data.utils.market_hours import session_date
+from financial_data.utils.zerodha_session import is_token_expired
+
+
+class Command(BaseCommand):
+    help = "Record today's holdings of every linked Zerodha account (schedule once a day after the close)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Session date to record under (YYYY-MM-DD); defaults to the latest session")
+
+    def handle(self, *args, **options):
+        try:
+            snapshot_date = date.fromisoformat(options["date"]) if options["date"] else session_date()
+        except ValueError:
+            raise CommandError("--date must be in YYYY-MM-DD format")
+
+        zerodha_users = [
+            zerodha_user for zerodha_user in ZerodhaUser.objects.select_related("user")
+            if not is_token_expired(zerodha_user)
+        ]
+        written, failed = record_snapshots(zerodha_users, snapshot_date)
+
+        self.stdout.write(f"Recorded {written} holdings for {len(zerodha_users) - len(failed)} users on {snapshot_date}")
+        for zerodha_user in failed:
+            self.stderr.write(f"Could not fetch holdings for {zerodha_user}")
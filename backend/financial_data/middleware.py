@@ -0,0 +1,63 @@
+from django.utils.functional import cached_property
+from rest_framework import status
+from rest_framework.response import Response
+
+from financial_data.utils.holdings_cache import invalidate_holdings
+from financial_data.utils.kite_clients import discard_kite_client
+from financial_data.utils.zerodha_session import get_zerodha_user, invalidate_zerodha_session, is_token_expired
+
+
+class ZerodhaSession:
+    """
+    The request user's Zerodha account, resolved on first use.
+
+    Resolution is deferred because DRF authenticates (JWT) after Django
+    middleware has run; by the time a view touches the session, request.user
+    is the authenticated user.
+    """
+
+    def __init__(self, request):
+        self._request = request
+
+    @cached_property
+    def _resolved(self):
+        user = self._request.user
+        if not user.is_authenticated:
+            return None, None
+        zerodha_user = get_zerodha_user(user)
+        if zerodha_user is None:
+            print(f"🔍 Backend: No Zerodha account found for user: {user.username}")
+            return None, Response({
+                "error": "Zerodha account not linked",
+                "code": "ACCOUNT_NOT_LINKED",
+                "action_required": "Please connect your Zerodha account first"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if is_token_expired(zerodha_user):
+            print(f"🔍 Backend: Token expired for user: {user.username}")
+            discard_kite_client(zerodha_user.access_token)
+            invalidate_holdings(user.id)
+            invalidate_zerodha_session(user.id)
+            zerodha_user.delete()
+            return None, Response({
+                "error": "Zerodha session has expired",
+                "code": "SESSION_EXPIRED",
+                "action_required": "Please reconnect your Zerodha account"
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        return zerodha_user, None
+
+    def resolve(self):
+        """(ZerodhaUser, None) for a valid session, otherwise (None, error Response)"""
+        return self._resolved
+
+
+class ZerodhaSessionMiddleware:
+    """Attaches a lazily resolved ZerodhaSession to every request as `request.zerodha_session`"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.zerodha_session = ZerodhaSession(request)
+        return self.get_response(request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial_data', '0002_holdingsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Instrument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument_token', models.BigIntegerField(unique=True)),
+                ('exchange_token', models.BigIntegerField()),
+                ('tradingsymbol', models.CharField(max_length=50)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('exchange', models.CharField(max_length=10)),
+                ('segment', models.CharField(max_length=20)),
+                ('instrument_type', models.CharField(max_length=10)),
+                ('lot_size', models.IntegerField(default=1)),
+                ('tick_size', models.FloatField(default=0.05)),
+                ('yfinance_symbol', models.CharField(max_length=60)),
+                ('loaded_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'instrument',
+                'indexes': [models.Index(fields=['tradingsymbol'], name='instrument_symbol_idx')],
+                'constraints': [models.UniqueConstraint(fields=('exchange', 'tradingsymbol'), name='unique_instrument_symbol')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial_data', '0003_instrument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=50, unique=True)),
+                ('rank', models.IntegerField()),
+                ('bucket', models.CharField(max_length=20)),
+                ('market_cap', models.FloatField(blank=True, null=True)),
+                ('ranked_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'cap_bucket',
+            },
+        ),
+    ]
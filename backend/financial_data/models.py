@@ -38,4 +38,65 @@ class RiskProfile(models.Model):
         return f"{self.user.username} - {self.risk_category} ({self.risk_score})"
 
     class Meta:
-        db_table = 'risk_profile'
\ No newline at end of file
+        db_table = 'risk_profile'
+
+class HoldingSnapshot(models.Model):
+    """One row per user, trading day and equity holding, written once a day by `manage.py snapshot_holdings`"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holding_snapshots')
+    date = models.DateField()
+    symbol = models.CharField(max_length=50)
+    quantity = models.IntegerField()
+    price = models.FloatField()
+    value = models.FloatField()
+
+    def __str__(self):
+        return f"{self.user.username} - {self.symbol} on {self.date}"
+
+    class Meta:
+        db_table = 'holding_snapshot'
+        # The constraint's (user, date, symbol) index also serves per-user date range scans
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'symbol'], name='unique_holding_snapshot'),
+        ]
+
+
+class Instrument(models.Model):
+    """Cash-segment rows of the Kite instruments dump, replaced wholesale by `manage.py load_instruments`"""
+    instrument_token = models.BigIntegerField(unique=True)
+    exchange_token = models.BigIntegerField()
+    tradingsymbol = models.CharField(max_length=50)
+    name = models.CharField(max_length=255, blank=True)
+    exchange = models.CharField(max_length=10)
+    segment = models.CharField(max_length=20)
+    instrument_type = models.CharField(max_length=10)
+    lot_size = models.IntegerField(default=1)
+    tick_size = models.FloatField(default=0.05)
+    yfinance_symbol = models.CharField(max_length=60)
+    loaded_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.exchange}:{self.tradingsymbol}"
+
+    class Meta:
+        db_table = 'instrument'
+        constraints = [
+            models.UniqueConstraint(fields=['exchange', 'tradingsymbol'], name='unique_instrument_symbol'),
+        ]
+        indexes = [
+            models.Index(fields=['tradingsymbol'], name='instrument_symbol_idx'),
+        ]
+
+
+class CapBucket(models.Model):
+    """Market-cap ranking of the classification universe, shared by every process (see utils/cap_classification.py)"""
+    symbol = models.CharField(max_length=50, unique=True)
+    rank = models.IntegerField()
+    bucket = models.CharField(max_length=20)
+    market_cap = models.FloatField(null=True, blank=True)  # null: kept at its stocks_list position
+    ranked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.symbol} - {self.bucket}"
+
+    class Meta:
+        db_table = 'cap_bucket'
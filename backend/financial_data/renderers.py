@@ -0,0 +1,24 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class CompactChartRenderer(JSONRenderer):
+    """JSON renderer selected by clients that accept the compact chart encoding"""
+    media_type = "application/vnd.wealthwise.compact+json"
+    format = "compact"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients that only accept text/event-stream pass content negotiation.
+
+    Streaming views return their own StreamingHttpResponse; this renders the
+    ordinary Response (an error, say) as a single `error` event.
+    """
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
@@ -5,11 +5,11 @@ stocks=[
     'KOTAKBANK','MARUTI','M&M','AXISBANK','ULTRACEMCO','NTPC','ONGC',
     'BAJAJFINSV','TITAN','WIPRO','HAL','ADANIENT','POWERGRID','ADANIPORTS',
     'DMART','TATAMOTORS','JSWSTEEL','COALINDIA','BAJAJ-AUTO','BEL','ETERNAL',
-    'NESTLEIND','ASIANPAINT','ADANIPOWER','TRENT','INDIGO','ЮС','HINDZINC',
+    'NESTLEIND','ASIANPAINT','ADANIPOWER','TRENT','INDIGO','IOC','HINDZINC',
     'DLF','TATASTEEL','VBL','IRFC','GRASIM','VEDL','JIOFIN','DIVISLAB',
     'SBILIFE','TECHM','LTIM','ADANIGREEN','PIDILITIND','HDFCLIFE','HYUNDAI',
     'EICHERMOT','HINDALCO','BAJAJHLDNG','PFC','AMBUJACEM','LODHA','BPCL',
-    'BRITANNIA','CHOLAF IN','ABB','TVSMOTOR','TATAPOWER','CIPLA','GODREJCP',
+    'BRITANNIA','CHOLAFIN','ABB','TVSMOTOR','TATAPOWER','CIPLA','GODREJCP',
     'BANKBARODA','GAIL','SHRIRAMFIN','PNB','RECLTD','INDHOTEL','SIEMENS',
     'SOLARINDS','TORNTPHARM','MAZDOCK','MAXHEALTH','UNITDSPR','SHREECEM',
     'TATACONSUM','DRREDDY','MANKIND','BAJAJHFL','ENRIN','ADANIENSOL',
@@ -1,3 +1,956 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from financial_data.middleware import ZerodhaSession, ZerodhaSessionMiddleware
+from financial_data.models import CapBucket, HoldingSnapshot, ZerodhaUser
+from financial_data.renderers import CompactChartRenderer
+from financial_data.utils import cap_classification, covariance, price_store, quote_cache, ticker_metadata, value_at_risk as var_module
+from financial_data.utils.charts import PERIODS, period_cutoff, slice_period
+from financial_data.utils.downsampling import lttb_indices
+from financial_data.utils.encoding import encode_compact
+from financial_data.utils.fetch_executor import fan_out
+from financial_data.utils.holding_snapshots import portfolio_value_series, record_snapshots
+from financial_data.utils.instruments import InstrumentIndex, load_instruments
+from financial_data.utils.market_data import MAX_PERIOD
+from financial_data.utils.quote_stream import QuoteBook, TickIngestionService
+from financial_data.utils.risk_scoring import build_cap_index, calc_final_risk, cap_bucket, score_portfolios
+from financial_data.utils.symbols import to_yfinance_symbol
+from financial_data.utils.tick_replay import (
+    ReplayProtocol, group_frames, load_ticks, pack_message, pack_quote, replay_factory,
+)
+from financial_data.utils.value_at_risk import value_at_risk
+
+
+def daily_frame(index, closes=None):
+    """OHLCV frame with the same price in every column"""
+    closes = np.linspace(100, 200, len(index)) if closes is None else np.asarray(closes, dtype="f8")
+    return pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1.0}, index=index
+    )
+
+
+class SlicePeriodTests(SimpleTestCase):
+    """Every chart period is sliced out of one 5y download"""
+
+    def setUp(self):
+        today = pd.Timestamp.now().normalize()
+        self.hist = daily_frame(pd.date_range(end=today, periods=6 * 366, freq="D"))
+
+    def test_each_period_starts_at_its_cutoff(self):
+        for period_name in PERIODS:
+            with self.subTest(period=period_name):
+                sliced = slice_period(self.hist, period_name)
+                cutoff = period_cutoff(period_name)
+                self.assertGreaterEqual(sliced.index[0], cutoff)
+                self.assertEqual(sliced.index[-1], self.hist.index[-1])
+                # The row just before the slice is outside the period
+                self.assertLess(self.hist.index[len(self.hist) - len(sliced) - 1], cutoff)
+
+    def test_longer_periods_contain_shorter_ones(self):
+        lengths = [len(slice_period(self.hist, period_name)) for period_name in PERIODS]
+        self.assertEqual(lengths, sorted(lengths))
+        self.assertEqual(len(slice_period(self.hist, "7d")), 8)
+
+    def test_tz_aware_index(self):
+        hist = daily_frame(self.hist.index.tz_localize("Asia/Kolkata"))
+        sliced = slice_period(hist, "1mo")
+        self.assertGreaterEqual(sliced.index[0], period_cutoff("1mo", hist.index.tz))
+
+    def test_empty_history(self):
+        self.assertTrue(slice_period(self.hist.iloc[:0], "1y").empty)
+
+
+class LttbTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.x = np.arange(1000)
+        self.y = np.cumsum(rng.normal(0, 1, len(self.x)))
+
+    def test_keeps_the_endpoints_and_exactly_max_points(self):
+        for max_points in (3, 10, 250, 999):
+            with self.subTest(max_points=max_points):
+                indices = lttb_indices(self.x, self.y, max_points)
+                self.assertEqual(len(indices), max_points)
+                self.assertEqual((indices[0], indices[-1]), (0, len(self.x) - 1))
+                self.assertTrue((np.diff(indices) > 0).all())
+
+    def test_keeps_a_spike(self):
+        y = np.zeros(len(self.x))
+        y[437] = 50
+        self.assertIn(437, lttb_indices(self.x, y, 20))
+
+    def test_short_series_pass_through(self):
+        for max_points in (len(self.x), len(self.x) + 1, 2):
+            with self.subTest(max_points=max_points):
+                np.testing.assert_array_equal(lttb_indices(self.x, self.y, max_points), np.arange(len(self.x)))
+
+
+def decode_compact(encoded):
+    """{symbol: {date: close}} and {symbol: {period: [dates]}} from the compact encoding"""
+    days = np.cumsum(encoded["dates"]).astype("datetime64[D]")
+    closes, periods = {}, {}
+    for symbol, item in encoded["symbols"].items():
+        total, closes[symbol] = 0, {}
+        for i, delta in enumerate(item["prices"]):
+            if delta is not None:
+                total += delta
+                closes[symbol][days[item["offset"] + i]] = total / encoded["price_scale"]
+        periods[symbol] = {
+            name: [day for day in days[slice(*period["range"])] if day in closes[symbol]]
+            for name, period in item["periods"].items()
+        }
+    return closes, periods
+
+
+class CompactEncodingTests(SimpleTestCase):
+    def test_round_trip_with_gaps(self):
+        dates = pd.bdate_range("2025-01-01", periods=40)
+        # Each symbol skips days the other traded, and BBB starts later
+        inputs = {
+            "AAA.NS": {"history": daily_frame(dates[::2], np.linspace(100, 120.55, 20)), "current_price": 121.0,
+                       "metrics": {"short": {"total_return": 1.5}}},
+            "BBB.NS": {"history": daily_frame(dates[5:].delete([3, 4, 10])), "current_price": 199.0, "metrics": {}},
+        }
+        cutoffs = {"short": dates[30], "long": dates[0] - pd.Timedelta(days=30), "future": dates[-1] + pd.Timedelta(days=1)}
+
+        encoded = encode_compact(inputs, cutoffs)
+        closes, periods = decode_compact(encoded)
+
+        self.assertIn(None, encoded["symbols"]["AAA.NS"]["prices"])
+        for symbol, item in inputs.items():
+            with self.subTest(symbol=symbol):
+                close = item["history"]["Close"]
+                expected = dict(zip(close.index.values.astype("datetime64[D]"), close.round(2)))
+                self.assertEqual(closes[symbol], expected)
+                self.assertEqual(periods[symbol]["long"], list(expected))
+                self.assertEqual(periods[symbol]["short"], [day for day in expected if day >= np.datetime64(dates[30].date())])
+                self.assertNotIn("future", periods[symbol])
+        short = encoded["symbols"]["AAA.NS"]["periods"]["short"]
+        self.assertEqual((short["total_return"], short["data_points"]), (1.5, 5))
+
+    def test_no_symbols(self):
+        self.assertEqual(encode_compact({}, {})["symbols"], {})
+
+
+class StockDataEncodingViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("investor", "investor@example.com", "password"))
+        self.url = reverse("get_stock_data")
+        today = pd.Timestamp.now().normalize()
+        inputs = {
+            "INFY.NS": {
+                "history": daily_frame(pd.bdate_range(end=today, periods=30)),
+                "current_price": 200.0,
+                "metrics": {name: {} for name in PERIODS},
+            },
+        }
+        patcher = mock.patch("financial_data.views.load_chart_inputs", side_effect=lambda symbols: {
+            symbol: inputs[symbol] for symbol in symbols if symbol in inputs
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body, **headers):
+        return self.client.post(self.url, {"symbols": ["INFY.NS", "NOPE.NS"], **body}, format="json", **headers)
+
+    def test_nested_by_default(self):
+        response = self.post({})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(len(response.data["data"]["INFY.NS"]["1mo"]["history"]), len(response.data["data"]["INFY.NS"]["1mo"]["dates"]))
+        self.assertEqual(response.data["failed_symbols"], ["NOPE.NS"])
+
+    def test_compact_is_selected_by_accept_or_body(self):
+        for case, body, headers in (
+            ("accept", {}, {"HTTP_ACCEPT": CompactChartRenderer.media_type}),
+            ("body", {"encoding": "compact"}, {}),
+        ):
+            with self.subTest(case):
+                response = self.post(body, **headers)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data["data"]["encoding"], "compact")
+                self.assertEqual(list(response.data["data"]["symbols"]), ["INFY.NS"])
+                self.assertEqual(response.data["failed_symbols"], ["NOPE.NS"])
+        # The media type names the format for clients that asked for it
+        self.assertEqual(
+            self.post({}, HTTP_ACCEPT=CompactChartRenderer.media_type)["Content-Type"], CompactChartRenderer.media_type
+        )
+
+
+def holding(tradingsymbol, quantity, last_price, product="CNC"):
+    return {"tradingsymbol": tradingsymbol, "exchange": "NSE", "product": product,
+            "quantity": quantity, "average_price": last_price, "last_price": last_price}
+
+
+class HoldingSnapshotTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f"user{i}", f"user{i}@example.com", "password") for i in range(2)]
+        self.zerodha_users = [
+            ZerodhaUser.objects.create(user=user, access_token=f"token{i}", api_key="key")
+            for i, user in enumerate(self.users)
+        ]
+        self.day = date(2025, 1, 6)
+
+    def record(self, holdings_by_token):
+        def get_holdings(zerodha_user):
+            holdings = holdings_by_token[zerodha_user.access_token]
+            if isinstance(holdings, Exception):
+                raise holdings
+            return holdings
+
+        with mock.patch("financial_data.utils.holding_snapshots.get_holdings", side_effect=get_holdings):
+            return record_snapshots(ZerodhaUser.objects.all(), self.day)
+
+    def symbols(self, user):
+        return dict(HoldingSnapshot.objects.filter(user=user, date=self.day).values_list("symbol", "quantity"))
+
+    def test_records_delivery_holdings_only(self):
+        written, failed = self.record({
+            "token0": [holding("INFY", 10, 1500.0), holding("TCS", 2, 4000.0, product="MIS")],
+            "token1": [],
+        })
+        self.assertEqual((written, failed), (1, []))
+        self.assertEqual(self.symbols(self.users[0]), {"INFY.NS": 10})
+
+    def test_rerun_replaces_the_day(self):
+        self.record({"token0": [holding("INFY", 10, 1500.0), holding("TCS", 2, 4000.0)], "token1": []})
+        self.record({"token0": [holding("INFY", 12, 1510.0)], "token1": []})
+        # The sold position is gone and the kept one is updated, not duplicated
+        self.assertEqual(self.symbols(self.users[0]), {"INFY.NS": 12})
+
+    def test_failed_user_keeps_earlier_rows(self):
+        self.record({"token0": [holding("INFY", 10, 1500.0)], "token1": [holding("TCS", 2, 4000.0)]})
+        written, failed = self.record({"token0": [holding("INFY", 11, 1500.0)], "token1": RuntimeError("Kite down")})
+        self.assertEqual(written, 1)
+        self.assertEqual(failed, [self.zerodha_users[1]])
+        self.assertEqual(self.symbols(self.users[1]), {"TCS.NS": 2})
+
+    def test_value_series(self):
+        self.record({"token0": [holding("INFY", 10, 1500.0), holding("TCS", 2, 4000.0)], "token1": []})
+        series = portfolio_value_series(self.users[0])
+        self.assertEqual(series, [{"date": self.day, "value": 23000.0, "holdings": 2}])
+        self.assertEqual(portfolio_value_series(self.users[0], start=date(2025, 1, 7)), [])
+
+
+class PortfolioHistoryViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("investor", "investor@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("get_portfolio_history")
+
+    def test_rejects_malformed_dates(self):
+        response = self.client.get(self.url, {"start": "06/01/2025"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_start_after_end(self):
+        response = self.client.get(self.url, {"start": "2025-02-01", "end": "2025-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_series_between_dates(self):
+        for day, value in ((date(2025, 1, 6), 100.0), (date(2025, 1, 7), 110.0), (date(2025, 1, 8), 120.0)):
+            HoldingSnapshot.objects.create(user=self.user, date=day, symbol="INFY.NS", quantity=1, price=value, value=value)
+        response = self.client.get(self.url, {"start": "2025-01-07", "end": "2025-01-08"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["series"],
+            [{"date": "2025-01-07", "value": 110.0, "holdings": 1}, {"date": "2025-01-08", "value": 120.0, "holdings": 1}],
+        )
+
+    def test_requires_authentication(self):
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ZerodhaSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("investor", "investor@example.com", "password")
+
+    def session(self, user=None):
+        return ZerodhaSession(SimpleNamespace(user=user or self.user))
+
+    def test_anonymous_user_resolves_to_nothing(self):
+        self.assertEqual(self.session(AnonymousUser()).resolve(), (None, None))
+
+    def test_unlinked_account(self):
+        zerodha_user, error_response = self.session().resolve()
+        self.assertIsNone(zerodha_user)
+        self.assertEqual(error_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(error_response.data["code"], "ACCOUNT_NOT_LINKED")
+
+    def test_valid_session_is_resolved_once(self):
+        linked = ZerodhaUser.objects.create(user=self.user, access_token="token", api_key="key")
+        session = self.session()
+        with mock.patch("financial_data.middleware.get_zerodha_user", return_value=linked) as lookup:
+            self.assertEqual(session.resolve(), (linked, None))
+            self.assertEqual(session.resolve(), (linked, None))
+        lookup.assert_called_once()
+
+    def test_expired_session_is_dropped(self):
+        linked = ZerodhaUser.objects.create(user=self.user, access_token="token", api_key="key")
+        ZerodhaUser.objects.filter(pk=linked.pk).update(updated_at=timezone.now() - timedelta(hours=19))
+        zerodha_user, error_response = self.session().resolve()
+        self.assertIsNone(zerodha_user)
+        self.assertEqual(error_response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(error_response.data["code"], "SESSION_EXPIRED")
+        self.assertFalse(ZerodhaUser.objects.filter(user=self.user).exists())
+        # The cached lookup was invalidated with the row
+        self.assertEqual(self.session().resolve()[1].status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_middleware_attaches_session(self):
+        request = SimpleNamespace(user=self.user)
+        response = ZerodhaSessionMiddleware(lambda request: "response")(request)
+        self.assertEqual(response, "response")
+        self.assertIsInstance(request.zerodha_session, ZerodhaSession)
+
+
+# 1 large, 1 mid and 1 small cap, with ranks padded out to the bucket boundaries
+CAP_INDEX = build_cap_index(["LARGE"] + [f"L{i}" for i in range(99)] + ["MID"] + [f"M{i}" for i in range(149)] + ["SMALL"])
+
+
+class ScorePortfoliosTests(SimpleTestCase):
+    """The vectorized scorer gives calc_final_risk's result for every portfolio"""
+
+    def assert_matches_scalar(self, fd_values, stock_values, mf_values, holdings):
+        scores, categories = score_portfolios(fd_values, stock_values, mf_values, holdings=holdings, cap_index=CAP_INDEX)
+        for i, portfolio in enumerate(holdings):
+            if portfolio is None:
+                expected = calc_final_risk(fd_values[i], mf_value=mf_values[i], mode="total",
+                                           total_stock_value=stock_values[i], cap_index=CAP_INDEX)
+            else:
+                expected = calc_final_risk(fd_values[i], holdings=portfolio, mf_value=mf_values[i], cap_index=CAP_INDEX)
+            with self.subTest(portfolio=i):
+                self.assertAlmostEqual(scores[i], expected[0], places=9)
+                self.assertEqual(categories[i], expected[1])
+
+    def test_random_portfolios(self):
+        rng = np.random.default_rng(7)
+        size = 2000
+        # Many zeros so the empty and single-asset branches are exercised
+        fd_values = (rng.integers(0, 4, size) * rng.uniform(0, 1e6, size)).round(2).tolist()
+        stock_values = (rng.integers(0, 4, size) * rng.uniform(0, 1e6, size)).round(2).tolist()
+        mf_values = (rng.integers(0, 4, size) * rng.uniform(0, 1e6, size)).round(2).tolist()
+        symbols = ["LARGE", "mid", "SMALL", "UNLISTED"]
+        holdings = [
+            None if rng.random() < 0.3 else {
+                symbol: float(rng.integers(0, 3) * rng.uniform(0, 5e5))
+                for symbol in rng.choice(symbols, rng.integers(0, 4), replace=False)
+            }
+            for _ in range(size)
+        ]
+        self.assert_matches_scalar(fd_values, stock_values, mf_values, holdings)
+
+    def test_edge_cases(self):
+        self.assert_matches_scalar(
+            [0, 0, 100, 0, 1000],
+            [0, 500, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [None, None, {}, {"UNLISTED": 100.0}, {"LARGE": 0.0}],
+        )
+
+    def test_without_holdings_scores_in_total_mode(self):
+        scores, categories = score_portfolios([1000], [1000], [0], cap_index=CAP_INDEX)
+        self.assertAlmostEqual(scores[0], calc_final_risk(1000, mode="total", total_stock_value=1000)[0])
+        self.assertEqual(categories, ["Moderate"])
+
+
+class CapClassificationTests(TestCase):
+    def setUp(self):
+        # stocks_list order is S0..S299; by market cap S299 is the largest
+        self.stocks = [f"S{i}" for i in range(300)]
+        for patcher in (
+            mock.patch.object(cap_classification, "stocks", self.stocks),
+            # Keep this process's default index untouched
+            mock.patch.object(cap_classification, "install_cap_index"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def metadata(self, covered):
+        return {f"{symbol}.NS": {"marketCap": (i + 1) * 10 ** 9} for i, symbol in enumerate(self.stocks) if i < covered}
+
+    def test_bucket_boundaries(self):
+        self.assertEqual(
+            [cap_bucket(rank) for rank in (0, 99, 100, 249, 250, 299)],
+            ["Large Cap", "Large Cap", "Mid Cap", "Mid Cap", "Small Cap", "Small Cap"],
+        )
+
+    def test_ranking_by_market_cap_is_stored_and_loaded(self):
+        index, coverage, stored = cap_classification.build_ranking(self.metadata(300))
+        self.assertEqual((coverage, stored), (1.0, True))
+        self.assertEqual((index["S299"], index["S200"], index["S199"], index["S50"], index["S49"]),
+                         ("Large Cap", "Large Cap", "Mid Cap", "Mid Cap", "Small Cap"))
+
+        classifier = cap_classification.CapClassifier()
+        # A request only reads the stored ranking
+        with self.assertNumQueries(1):
+            self.assertEqual(classifier.get_index(), index)
+        self.assertEqual(classifier.source, "market_cap")
+
+    @override_settings(CAP_INDEX_MIN_COVERAGE=0.9)
+    def test_too_little_coverage_falls_back_to_stocks_list(self):
+        index, coverage, stored = cap_classification.build_ranking(self.metadata(200))
+        self.assertEqual((round(coverage, 2), stored), (0.67, False))
+        self.assertEqual(index, build_cap_index(self.stocks))
+        self.assertFalse(CapBucket.objects.exists())
+
+        classifier = cap_classification.CapClassifier()
+        self.assertEqual(classifier.get_index(), build_cap_index(self.stocks))
+        self.assertEqual(classifier.source, "stocks_list")
+
+    def test_stale_ranking_beats_stocks_list(self):
+        index, _, _ = cap_classification.build_ranking(self.metadata(300))
+        ranked_at = timezone.now() - timedelta(days=3)
+        CapBucket.objects.update(ranked_at=ranked_at)
+        # A later build with too little coverage leaves it in place
+        cap_classification.build_ranking(self.metadata(10))
+
+        classifier = cap_classification.CapClassifier()
+        with self.assertNumQueries(1):
+            self.assertEqual(classifier.get_index(), index)
+        self.assertEqual((classifier.source, classifier.ranked_at), ("market_cap", ranked_at))
+        self.assertEqual(set(CapBucket.objects.values_list("ranked_at", flat=True)), {ranked_at})
+
+
+@mock.patch("financial_data.views.get_cap_index", return_value=CAP_INDEX)
+class RiskBatchViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("advisor", "advisor@example.com", "password"))
+        self.url = reverse("calculate_risk_batch")
+
+    def post(self, **body):
+        return self.client.post(self.url, body, format="json")
+
+    def test_scores_in_input_order(self, _):
+        response = self.post(fd_values=[1000, 0], stock_values=[0, 0], mf_values=[0, 0], holdings=[None, {"SMALL": 500}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["risk_scores"], [1.0, 3.0])
+        self.assertEqual(response.data["risk_categories"], ["Conservative (Low Risk)", "Aggressive (High Risk)"])
+
+    def test_rejects_invalid_input(self, _):
+        invalid = {
+            "missing array": {"fd_values": [1], "stock_values": [1]},
+            "unequal lengths": {"fd_values": [1, 2], "stock_values": [1], "mf_values": [1]},
+            "holdings length": {"fd_values": [1], "stock_values": [1], "mf_values": [1], "holdings": [None, None]},
+            "negative value": {"fd_values": [-1], "stock_values": [1], "mf_values": [1]},
+            "boolean value": {"fd_values": [True], "stock_values": [1], "mf_values": [1]},
+            "string value": {"fd_values": ["1"], "stock_values": [1], "mf_values": [1]},
+            "holdings entry": {"fd_values": [1], "stock_values": [1], "mf_values": [1], "holdings": [[1]]},
+            "holding value": {"fd_values": [1], "stock_values": [1], "mf_values": [1], "holdings": [{"LARGE": -5}]},
+        }
+        for case, body in invalid.items():
+            with self.subTest(case):
+                self.assertEqual(self.post(**body).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RISK_BATCH_MAX_PORTFOLIOS=2)
+    def test_rejects_too_many_portfolios(self, _):
+        response = self.post(fd_values=[1, 1, 1], stock_values=[1, 1, 1], mf_values=[1, 1, 1])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceStoreSyncTests(SimpleTestCase):
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        overrides = override_settings(PRICE_STORE_DIR=store.name, PRICE_STORE_SYNC_INTERVAL=3600)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(price_store, "bulk_download")
+        self.bulk_download = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.dates = pd.bdate_range("2025-01-01", periods=12)
+        self.closes = np.arange(100.0, 112.0)
+        price_store._write("AAA.NS", daily_frame(self.dates[:10], self.closes[:10]))
+        self.make_stale("AAA.NS")
+
+    def make_stale(self, symbol):
+        os.utime(price_store._path(symbol), (0, 0))
+
+    def stored_closes(self, symbol):
+        return price_store.read(symbol)["close"].tolist()
+
+    def test_resumes_from_the_second_to_last_bar_and_rewrites_the_last(self):
+        # The stored last bar was today's, still moving; the download has its final close
+        closes = self.closes.copy()
+        closes[9] = 109.5
+        self.bulk_download.return_value = ({"AAA.NS": daily_frame(self.dates[8:], closes[8:])}, [])
+
+        price_store.sync(["AAA.NS"])
+
+        self.bulk_download.assert_called_once_with(["AAA.NS"], start=str(self.dates[8].date()))
+        self.assertEqual(self.stored_closes("AAA.NS"), closes.tolist())
+        self.assertEqual(
+            price_store.read("AAA.NS")["date"].tolist(),
+            self.dates.values.astype("datetime64[D]").astype(int).tolist(),
+        )
+        self.assertTrue(price_store._is_fresh("AAA.NS"))
+
+    def test_readjusted_history_is_rebuilt(self):
+        # A split halves every completed close upstream
+        adjusted = daily_frame(self.dates, self.closes / 2)
+        self.bulk_download.side_effect = [({"AAA.NS": adjusted.iloc[8:]}, []), ({"AAA.NS": adjusted}, [])]
+
+        price_store.sync(["AAA.NS"])
+
+        self.assertEqual(self.bulk_download.call_count, 2)
+        self.assertEqual(self.bulk_download.call_args, mock.call(["AAA.NS"], period=MAX_PERIOD))
+        self.assertEqual(self.stored_closes("AAA.NS"), (self.closes / 2).tolist())
+
+    def test_failed_download_stays_stale(self):
+        self.bulk_download.return_value = ({}, ["AAA.NS"])
+
+        price_store.sync(["AAA.NS"])
+
+        self.assertEqual(self.stored_closes("AAA.NS"), self.closes[:10].tolist())
+        self.assertFalse(price_store._is_fresh("AAA.NS"))
+        price_store.sync(["AAA.NS"])
+        self.assertEqual(self.bulk_download.call_count, 2)
+
+    def test_nothing_new_upstream_marks_the_symbol_synced(self):
+        self.bulk_download.return_value = ({}, [])
+
+        price_store.sync(["AAA.NS"])
+        price_store.sync(["AAA.NS"])
+
+        self.bulk_download.assert_called_once()
+        self.assertEqual(self.stored_closes("AAA.NS"), self.closes[:10].tolist())
+
+
+class FanOutTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def fetch(self, item):
+        if item == "slow":
+            self.release.wait(10)
+        if item == "broken":
+            raise RuntimeError("upstream error")
+        return item.upper()
+
+    def test_slow_and_failing_items_are_reported(self):
+        started = time.monotonic()
+        results, failed = fan_out(self.fetch, ["a", "slow", "broken", "b"], max_workers=4, item_timeout=0.2, deadline=5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(results, {"a": "A", "b": "B"})
+        self.assertEqual(failed, ["slow", "broken"])
+
+    def test_deadline_bounds_the_whole_call(self):
+        results, failed = fan_out(self.fetch, ["slow", "a"], max_workers=1, item_timeout=5, deadline=0.2)
+        self.assertEqual((results, failed), ({}, ["slow", "a"]))
+
+
+class QuoteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.object(quote_cache, "quote_book", QuoteBook())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_misses_share_one_upstream_fetch(self):
+        fetching, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def get_live_prices(symbols):
+            fetching.set()
+            release.wait(10)
+            return {symbol: 1500.0 for symbol in symbols}
+
+        results = []
+        with mock.patch.object(quote_cache, "get_live_prices", side_effect=get_live_prices) as upstream:
+            first = threading.Thread(target=lambda: results.append(quote_cache.get_quotes(["INFY.NS"])))
+            first.start()
+            self.assertTrue(fetching.wait(5))
+            # Every later miss finds the fetch in flight (or its cached result) and waits for it
+            others = [threading.Thread(target=lambda: results.append(quote_cache.get_quotes(["INFY.NS"]))) for _ in range(5)]
+            for thread in others:
+                thread.start()
+            release.set()
+            for thread in [first, *others]:
+                thread.join(10)
+
+        upstream.assert_called_once_with(["INFY.NS"])
+        self.assertEqual(results, [{"INFY.NS": 1500.0}] * 6)
+        self.assertEqual(quote_cache._inflight, {})
+
+
+class ValueAtRiskTests(SimpleTestCase):
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        overrides = override_settings(PRICE_STORE_DIR=store.name, PRICE_STORE_SYNC_INTERVAL=10 ** 9)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Nothing is downloaded; symbols missing from the store stay missing
+        patcher = mock.patch.object(price_store, "bulk_download", return_value=({}, []))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        var_module._scenario_memo.clear()
+        var_module._result_memo.clear()
+
+        self.as_of = date(2025, 6, 30)
+        self.dates = pd.bdate_range(end=self.as_of, periods=600)
+        rng = np.random.default_rng(3)
+        self.closes = {
+            "AAA.NS": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(self.dates)))),
+            "BBB.NS": 50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(self.dates)))),
+        }
+        for symbol, closes in self.closes.items():
+            price_store._write(symbol, daily_frame(self.dates, closes))
+
+    def row(self, result, confidence, horizon, method):
+        return next(
+            row for row in result["risk"]
+            if (row["confidence"], row["horizon_days"], row["method"]) == (confidence, horizon, method)
+        )
+
+    def test_historical_var_replays_the_window(self):
+        positions = {"AAA.NS": 60000.0, "BBB.NS": 40000.0}
+        result = value_at_risk(positions, self.as_of, lookback=365, confidence_levels=(0.99,))
+
+        in_window = self.dates > pd.Timestamp(self.as_of - timedelta(days=365))
+        pnl = sum(
+            value * (self.closes[symbol][1:] / self.closes[symbol][:-1] - 1)[in_window[1:]]
+            for symbol, value in positions.items()
+        )
+        losses = -pnl
+        expected_var = np.quantile(losses, 0.99)
+        row = self.row(result, 0.99, 1, "historical")
+        self.assertAlmostEqual(row["value_at_risk"], expected_var, places=1)
+        self.assertAlmostEqual(row["expected_shortfall"], losses[losses >= expected_var].mean(), places=1)
+        self.assertEqual(result["observations"], len(pnl))
+        self.assertEqual(result["portfolio_value"], 100000.0)
+        # Expected Shortfall is never below VaR, and 10-day losses exceed 1-day ones
+        for row in result["risk"]:
+            self.assertGreaterEqual(row["expected_shortfall"], row["value_at_risk"])
+        self.assertGreater(
+            self.row(result, 0.99, 10, "parametric")["value_at_risk"], self.row(result, 0.99, 1, "parametric")["value_at_risk"]
+        )
+
+    def test_recent_listing_shortens_the_window(self):
+        listed = self.dates[-200:]
+        price_store._write("NEW.NS", daily_frame(listed))
+        result = value_at_risk({"AAA.NS": 1000.0, "NEW.NS": 1000.0}, self.as_of, lookback=365)
+        # The first scenario is the listing's first return, not a flat day before it
+        self.assertEqual(result["window_start"], listed[1].date().isoformat())
+        self.assertEqual(result["window_end"], self.as_of.isoformat())
+        self.assertEqual(result["observations"], 199)
+        self.assertEqual(result["effective_lookback"], (self.as_of - listed[1].date()).days + 1)
+
+    def test_missing_symbols_and_too_little_history(self):
+        result = value_at_risk({"AAA.NS": 1000.0, "NOPE.NS": 1000.0}, self.as_of, lookback=365)
+        self.assertEqual(result["symbols"], ["AAA.NS"])
+        self.assertEqual(result["missing_symbols"], ["NOPE.NS"])
+        self.assertEqual(result["portfolio_value"], 1000.0)
+
+        price_store._write("NEW.NS", daily_frame(self.dates[-30:]))
+        result = value_at_risk({"AAA.NS": 1000.0, "NEW.NS": 1000.0}, self.as_of, lookback=365)
+        self.assertEqual(result["observations"], 29)
+        self.assertEqual(result["risk"], [])
+
+    def test_history_ending_before_the_window_is_missing(self):
+        price_store._write("OLD.NS", daily_frame(self.dates[:100]))
+        positions = {"AAA.NS": 1000.0, "BBB.NS": 1000.0, "OLD.NS": 1000.0}
+        result = value_at_risk(positions, self.as_of, lookback=365)
+        self.assertEqual(result["symbols"], ["AAA.NS", "BBB.NS"])
+        self.assertEqual(result["missing_symbols"], ["OLD.NS"])
+        self.assertEqual(result["portfolio_value"], 2000.0)
+        # The window is the one the remaining holdings have on their own
+        alone = value_at_risk({"AAA.NS": 1000.0, "BBB.NS": 1000.0}, self.as_of, lookback=365)
+        self.assertEqual(result["observations"], alone["observations"])
+        self.assertGreater(result["observations"], 200)
+        self.assertEqual(result["risk"], alone["risk"])
+
+
+class CovarianceMatrixTests(SimpleTestCase):
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        overrides = override_settings(PRICE_STORE_DIR=store.name, PRICE_STORE_SYNC_INTERVAL=10 ** 9)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(price_store, "bulk_download", return_value=({}, []))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        covariance._memo.clear()
+        self.addCleanup(covariance._memo.clear)
+
+        self.as_of = date(2025, 6, 30)
+        dates = pd.bdate_range(end=self.as_of, periods=300)
+        rng = np.random.default_rng(11)
+        # Each symbol skips different days, and CCC lists late
+        bars = {
+            "AAA.NS": dates[rng.random(len(dates)) > 0.1],
+            "BBB.NS": dates[rng.random(len(dates)) > 0.2],
+            "CCC.NS": dates[150:][rng.random(150) > 0.1],
+        }
+        for symbol, index in bars.items():
+            price_store._write(symbol, daily_frame(index, 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))))
+
+    def matrices(self, symbols):
+        return covariance.covariance_matrices(symbols, 365, self.as_of)
+
+    def test_superset_reuses_the_memoized_subset(self):
+        self.matrices(["AAA.NS", "BBB.NS"])
+        with mock.patch.object(covariance, "_pair_sums", wraps=covariance._pair_sums) as pair_sums:
+            symbols, cov, corr = self.matrices(["AAA.NS", "BBB.NS", "CCC.NS"])
+        # Only the added symbol's row was computed
+        (rows, *_), _ = pair_sums.call_args
+        self.assertEqual((pair_sums.call_count, len(rows)), (1, 1))
+
+        covariance._memo.clear()
+        fresh_symbols, fresh_cov, fresh_corr = self.matrices(["AAA.NS", "BBB.NS", "CCC.NS"])
+        self.assertEqual(symbols, fresh_symbols)
+        np.testing.assert_allclose(cov, fresh_cov, rtol=1e-12)
+        np.testing.assert_allclose(corr, fresh_corr, rtol=1e-12)
+
+        # Pairwise-complete statistics, as pandas computes them
+        _, _, returns = covariance._window_returns(symbols, 365, self.as_of)
+        frame = pd.DataFrame(returns.T, columns=symbols)
+        np.testing.assert_allclose(cov, frame.cov(min_periods=2).to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(corr, frame.corr(min_periods=2).to_numpy(), rtol=1e-9)
+
+
+class ValueAtRiskViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("investor", "investor@example.com", "password"))
+        self.url = reverse("get_value_at_risk")
+
+    def test_rejects_invalid_lookback(self):
+        for lookback in ("abc", "89", "3651"):
+            with self.subTest(lookback=lookback):
+                response = self.client.get(self.url, {"lookback": lookback})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_linked_account(self):
+        cache.clear()
+        response = self.client.get(self.url, {"lookback": "365"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+SAMPLE_TICKS = os.path.join(os.path.dirname(__file__), "fixtures", "sample_ticks.jsonl")
+
+
+def wait_for(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TickReplayEncodingTests(SimpleTestCase):
+    def test_pack_quote_is_a_quote_mode_packet(self):
+        from kiteconnect import KiteTicker
+
+        tick = load_ticks(SAMPLE_TICKS)[0]
+        packet = pack_quote(tick)
+        self.assertEqual(len(packet), 44)
+        (parsed,) = KiteTicker(api_key="key", access_token="token")._parse_binary(pack_message([tick]))
+        self.assertEqual(parsed["mode"], KiteTicker.MODE_QUOTE)
+        self.assertEqual(parsed["instrument_token"], tick["instrument_token"])
+        self.assertEqual(parsed["last_price"], tick["last_price"])
+        self.assertEqual(parsed["volume_traded"], tick["volume_traded"])
+        self.assertEqual(parsed["ohlc"], tick["ohlc"])
+
+    def test_frames_hold_one_tick_per_instrument(self):
+        ticks = load_ticks(SAMPLE_TICKS)
+        for frame in group_frames(ticks):
+            tokens = [tick["instrument_token"] for tick in frame]
+            self.assertEqual(len(tokens), len(set(tokens)))
+        self.assertEqual(sum(len(frame) for frame in group_frames(ticks)), len(ticks))
+
+
+class TrackedReplayProtocol(ReplayProtocol):
+    """Replay connection the test can drop from the server side"""
+
+    def onOpen(self):
+        super().onOpen()
+        self.factory.connections.append(self)
+
+
+class TickReplayTests(SimpleTestCase):
+    """The ingestion service against the local replay server, end to end over a socket"""
+
+    def setUp(self):
+        from twisted.internet import reactor, threads
+
+        self.ticks = load_ticks(SAMPLE_TICKS)
+        self.factory = replay_factory("ws://127.0.0.1", self.ticks, interval=0.01, loop=False)
+        self.factory.protocol = TrackedReplayProtocol
+        self.factory.connections = []
+        # The reactor runs in KiteTicker's thread once started and cannot be restarted
+        if reactor.running:
+            self.port = threads.blockingCallFromThread(reactor, reactor.listenTCP, 0, self.factory, interface="127.0.0.1")
+        else:
+            self.port = reactor.listenTCP(0, self.factory, interface="127.0.0.1")
+        url = f"ws://127.0.0.1:{self.port.getHost().port}"
+        # The server checks the port clients connect to against its URL
+        self.factory.setSessionParameters(url)
+        overrides = override_settings(KITE_TICKER_ROOT=url, KITE_TICKER_RECONNECT_TRIES=5)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.book = QuoteBook()
+        self.service = TickIngestionService(self.book)
+
+    def tearDown(self):
+        from twisted.internet import reactor, threads
+
+        if not reactor.running:
+            self.port.stopListening()
+            return
+        ticker = self.service._ticker
+        if ticker is not None:
+            reactor.callFromThread(ticker.close)
+        threads.blockingCallFromThread(reactor, self.port.stopListening)
+
+    def last_ticks(self, ticks):
+        return {tick["instrument_token"]: tick for tick in ticks}
+
+    def has_quotes(self, expected):
+        return all(
+            self.book.get(token) is not None and self.book.get(token).last_price == tick["last_price"]
+            for token, tick in expected.items()
+        )
+
+    def test_stream_fills_the_quote_book_and_survives_a_dropped_connection(self):
+        from twisted.internet import reactor
+
+        expected = self.last_ticks(self.ticks)
+        started_at = time.time()
+        self.service.subscribe(expected)
+        self.service.ensure_running("token")
+
+        self.assertTrue(wait_for(lambda: self.has_quotes(expected)), "replayed ticks never reached the quote book")
+        for token, tick in expected.items():
+            quote = self.book.get(token)
+            self.assertEqual(quote.close, tick["ohlc"]["close"])
+            self.assertEqual(quote.volume, tick["volume_traded"])
+            # Quote-mode packets carry no exchange timestamp; the book stamps arrival time
+            self.assertTrue(started_at <= quote.received_at <= time.time())
+
+        # The server drops the connection and replays moved prices to whoever reconnects
+        moved = [{**tick, "last_price": round(tick["last_price"] + 1, 2)} for tick in self.ticks]
+        self.factory.frames = group_frames(moved)
+        reactor.callFromThread(self.factory.connections[0].transport.abortConnection)
+
+        self.assertTrue(
+            wait_for(lambda: self.has_quotes(self.last_ticks(moved))), "the ticker did not reconnect and resubscribe"
+        )
+        self.assertEqual(len(self.factory.connections), 2)
+        self.assertTrue(self.service.is_running())
+
+
+def instrument_row(instrument_token, tradingsymbol, exchange, segment=None):
+    return {
+        "instrument_token": instrument_token, "exchange_token": instrument_token // 256, "tradingsymbol": tradingsymbol,
+        "name": tradingsymbol, "exchange": exchange, "segment": segment or exchange, "instrument_type": "EQ",
+        "lot_size": "1", "tick_size": "0.05",
+    }
+
+
+class InstrumentIndexTests(TestCase):
+    def test_empty_table_falls_back_to_the_suffix_rule(self):
+        index = InstrumentIndex()
+        with mock.patch.object(index, "_start_reload") as start_reload, \
+                mock.patch("financial_data.utils.instruments.KiteConnect") as kite_connect:
+            self.assertIsNone(index.lookup("INFY"))
+        start_reload.assert_not_called()
+        kite_connect.assert_not_called()
+        self.assertEqual(to_yfinance_symbol("IDEA-BE"), "IDEA.NS")
+        self.assertEqual(to_yfinance_symbol("SBIN", "BSE"), "SBIN.BO")
+
+    def test_new_load_is_indexed_once(self):
+        load_instruments([
+            instrument_row(408065, "INFY", "NSE"),
+            instrument_row(500209 * 256 + 1, "INFY", "BSE"),
+            instrument_row(9999 * 256 + 1, "BSEONLY", "BSE"),
+            instrument_row(3456 * 256, "IDEA-BE", "NSE"),
+            instrument_row(13368834, "NIFTY24DECFUT", "NFO", segment="NFO-FUT"),
+        ])
+        index = InstrumentIndex()
+        with mock.patch.object(index, "_start_reload") as start_reload:
+            self.assertIsNone(index.lookup("INFY"))
+            (loaded_at,), _ = start_reload.call_args
+            index._reload(loaded_at)
+            index.invalidate()
+            # Unchanged table: the index is not rebuilt again
+            self.assertEqual(index.lookup("INFY").instrument_token, 408065)
+        start_reload.assert_called_once()
+
+        self.assertEqual(index.lookup("INFY", "BSE").exchange, "BSE")
+        self.assertEqual(index.lookup("BSEONLY").yfinance_symbol, "BSEONLY.BO")
+        self.assertEqual(index.lookup("IDEA").yfinance_symbol, "IDEA.NS")
+        self.assertIsNone(index.lookup("NIFTY24DECFUT"))
+
+
+class TickerMetadataTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(ticker_metadata, "_ensure_refresher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_fetch_is_left_out(self):
+        def info(symbol):
+            if symbol == "BROKEN.NS":
+                raise ValueError("no data")
+            return SimpleNamespace(info={"longName": symbol, "sector": "Technology", "marketCap": 10})
+
+        with mock.patch.object(ticker_metadata.yf, "Ticker", side_effect=info) as ticker:
+            metadata = ticker_metadata.get_ticker_metadata(["INFY.NS", "BROKEN.NS"])
+            self.assertEqual(metadata, {"INFY.NS": {"longName": "INFY.NS", "sector": "Technology", "marketCap": 10}})
+            # The successful entry is cached; the failed one is tried again
+            ticker_metadata.get_ticker_metadata(["INFY.NS", "BROKEN.NS"])
+        self.assertEqual(sorted(call.args[0] for call in ticker.call_args_list), ["BROKEN.NS", "BROKEN.NS", "INFY.NS"])
+
+
+class StockDetailsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("investor", "investor@example.com", "password")
+        ZerodhaUser.objects.create(user=self.user, access_token="token", api_key="key")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_holding_without_metadata_is_listed_and_reported(self):
+        holdings = [holding("INFY", 10, 1500.0), holding("BROKEN", 5, 100.0)]
+        metadata = {"INFY.NS": {"longName": "Infosys Limited", "sector": "Technology"}}
+        with mock.patch("financial_data.views.get_holdings", return_value=holdings), \
+                mock.patch("financial_data.views.get_quotes", return_value={"INFY.NS": 1510.0, "BROKEN.NS": 101.0}), \
+                mock.patch("financial_data.views.price_store.get_history", return_value={}), \
+                mock.patch("financial_data.views.get_ticker_metadata", return_value=metadata):
+            response = self.client.get(reverse("get_stock_details"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stocks = {stock["symbol"]: stock for stock in response.data["stocks"]}
+        self.assertEqual(stocks["INFY.NS"]["longName"], "Infosys Limited")
+        self.assertIsNone(stocks["BROKEN.NS"]["longName"])
+        self.assertIsNone(stocks["BROKEN.NS"]["sector"])
+        self.assertEqual(stocks["BROKEN.NS"]["currentPrice"], 101.0)
+        self.assertEqual(response.data["failed_symbols"], ["BROKEN.NS"])
+        self.assertEqual(response.data["portfolio_summary"]["total_stocks"], 2)
@@ -8,8 +8,13 @@ urlpatterns = [
     path('kite/disconnect/', views.disconnect_zerodha, name='disconnect_zerodha'),
     path('kite/holdings/', views.get_user_stock_holdings, name='get_user_holdings'),
     path('risk/calculate/', views.calculate_risk_tolerance, name='calculate_risk'),
+    path('risk/batch/', views.calculate_risk_batch, name='calculate_risk_batch'),
+    path('risk/var/', views.get_value_at_risk, name='get_value_at_risk'),
     path('risk/profile/', views.get_risk_profile, name='get_risk_profile'),
     path('stocks/details/', views.get_stock_details, name='get_stock_details'),
+    path('stocks/valuation/stream/', views.stream_portfolio_valuation, name='stream_portfolio_valuation'),
+    path('stocks/correlation/', views.get_holdings_correlation, name='get_holdings_correlation'),
+    path('portfolio/history/', views.get_portfolio_history, name='get_portfolio_history'),
     path('test-auth/', views.test_auth, name='test_auth'),
     path("api/financial/stocks/", views.get_stock_data, name="get_stock_data"),
 ]
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Vectorized per-period analytics for a set of holdings.
+
+Every symbol's closes are aligned on one shared date axis as a symbols x dates
+NumPy matrix (NaN where a symbol did not trade), and each metric is computed
+for all symbols of a period in a handful of array operations.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+TRADING_DAYS = 252
+BENCHMARK_SYMBOL = "NIFTYBEES.NS"
+
+
+def align_closes(history):
+    """
+    Align closes from {symbol: OHLCV frame} on the union of their dates.
+
+    Returns (symbols, dates, closes) where closes[i, j] is the close of
+    symbols[i] on dates[j], or NaN if it has no bar that day.
+    """
+    symbols = list(history)
+    if not symbols:
+        return symbols, pd.DatetimeIndex([]), np.empty((0, 0))
+    frame = pd.concat({symbol: history[symbol]["Close"] for symbol in symbols}, axis=1, sort=True)
+    return symbols, frame.index, frame.to_numpy(dtype="f8").T
+
+
+def forward_fill(matrix):
+    """Carry the last observed value forward along each row (leading NaNs stay NaN)."""
+    columns = np.arange(matrix.shape[1])
+    last_seen = np.where(np.isnan(matrix), 0, columns)
+    np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+    # Positions before a row's first observation point at column 0, which is NaN for them
+    return matrix[np.arange(matrix.shape[0])[:, None], last_seen]
+
+
+def daily_returns(closes):
+    """Return between each bar and the symbol's previous bar; NaN where there is no bar."""
+    previous = np.full_like(closes, np.nan)
+    previous[:, 1:] = forward_fill(closes)[:, :-1]
+    return closes / previous - 1
+
+
+def _first_valid(matrix):
+    return np.argmax(~np.isnan(matrix), axis=1)
+
+
+def _last_valid(matrix):
+    return matrix.shape[1] - 1 - np.argmax(~np.isnan(matrix[:, ::-1]), axis=1)
+
+
+def window_metrics(closes, returns, start, benchmark_returns=None, risk_free_rate=None):
+    """
+    Metrics for every symbol over columns [start:] of the aligned matrices.
+
+    Returns a dict of arrays (one value per symbol): total_return, volatility and
+    max_drawdown in percent, annualized sharpe_ratio and beta vs the benchmark.
+    """
+    if risk_free_rate is None:
+        risk_free_rate = settings.RISK_FREE_RATE
+    rows = np.arange(closes.shape[0])
+    prices = closes[:, start:]
+    window_returns = returns[:, start:].copy()
+
+    first = _first_valid(prices)
+    last = _last_valid(prices)
+    # The first bar in the window has no previous bar inside the window
+    window_returns[rows, first] = np.nan
+
+    with warnings.catch_warnings():
+        # All-NaN rows (no bars in the window) legitimately produce NaN metrics
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        start_price = prices[rows, first]
+        end_price = prices[rows, last]
+        total_return = (end_price - start_price) / start_price * 100
+
+        std = np.nanstd(window_returns, axis=1, ddof=1)
+        volatility = std * 100
+
+        filled = forward_fill(prices)
+        drawdowns = filled / np.fmax.accumulate(filled, axis=1) - 1
+        max_drawdown = np.nanmin(drawdowns, axis=1) * 100
+
+        excess = np.nanmean(window_returns, axis=1) - risk_free_rate / TRADING_DAYS
+        sharpe_ratio = excess / std * np.sqrt(TRADING_DAYS)
+
+        beta = np.full(closes.shape[0], np.nan)
+        if benchmark_returns is not None:
+            bench = np.broadcast_to(benchmark_returns[start:], window_returns.shape)
+            mask = ~np.isnan(window_returns) & ~np.isnan(bench)
+            r = np.where(mask, window_returns, np.nan)
+            b = np.where(mask, bench, np.nan)
+            r_dev = r - np.nanmean(r, axis=1, keepdims=True)
+            b_dev = b - np.nanmean(b, axis=1, keepdims=True)
+            beta = np.nansum(r_dev * b_dev, axis=1) / np.nansum(b_dev * b_dev, axis=1)
+
+    return {
+        "total_return": total_return,
+        "volatility": volatility,
+        "max_drawdown": max_drawdown,
+        "sharpe_ratio": sharpe_ratio,
+        "beta": beta,
+    }
+
+
+def compute_period_metrics(history, period_cutoffs, benchmark=BENCHMARK_SYMBOL):
+    """
+    Compute window_metrics for every symbol and period in one aligned pass.
+
+    `period_cutoffs` maps period name -> first date included in that period.
+    Returns {symbol: {period: {metric: float or None}}}; the benchmark is used
+    for beta only when it is present in `history`.
+    """
+    symbols, dates, closes = align_closes(history)
+    if not symbols:
+        return {}
+    returns = daily_returns(closes)
+    benchmark_returns = returns[symbols.index(benchmark)] if benchmark in symbols else None
+
+    result = {symbol: {} for symbol in symbols}
+    for period_name, cutoff in period_cutoffs.items():
+        start = int(dates.searchsorted(cutoff))
+        if start >= len(dates):
+            continue
+        metrics = window_metrics(closes, returns, start, benchmark_returns)
+        for i, symbol in enumerate(symbols):
+            result[symbol][period_name] = {
+                name: None if np.isnan(values[i]) else round(float(values[i]), 2)
+                for name, values in metrics.items()
+            }
+    return result
@@ -0,0 +1,133 @@
+"""
+Cap-bucket index ranked by actual market caps.
+
+The universe is the stocks_list symbols, ranked by their market caps. A
+ranking replaces the hand-maintained order once at least
+CAP_INDEX_MIN_COVERAGE of the universe has a market cap; symbols still
+without one keep their stocks_list position.
+
+Rankings are built and stored in the `cap_bucket` table only by `manage.py
+build_cap_index` (scheduled daily), which fetches the universe's metadata
+first. Every other process (web workers, `manage.py recalculate_risk`) only
+reads the table, every CAP_INDEX_RELOAD_INTERVAL seconds. A stored ranking
+older than CAP_INDEX_REBUILD_INTERVAL is still used, with a warning; without
+a stored ranking processes use the stocks_list order and check the table
+again every CAP_INDEX_RETRY_INTERVAL seconds.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from financial_data.models import CapBucket
+from financial_data.stocks_list import stocks
+from financial_data.utils.risk_scoring import build_cap_index, cap_bucket, install_cap_index
+from financial_data.utils.symbols import to_yfinance_symbol
+
+
+def universe():
+    """The symbols ranked into cap buckets, in stocks_list order"""
+    return list(dict.fromkeys(s.upper() for s in stocks if str(s).lower() != 'nan'))
+
+
+def rank_by_market_cap(metadata_by_symbol):
+    """
+    (ranked symbols, {symbol: market cap or None}, coverage) from {symbol: info-like dict}.
+
+    Symbols without a market cap keep their stocks_list position relative to
+    the ranked ones, so partial data never promotes an unknown small cap.
+    """
+    symbols = universe()
+    market_caps = {s: metadata_by_symbol.get(s, {}).get("marketCap") or None for s in symbols}
+    known = sorted((s for s in symbols if market_caps[s]), key=lambda s: market_caps[s], reverse=True)
+    coverage = len(known) / len(symbols) if symbols else 0
+
+    ranked = iter(known)
+    ordered = [next(ranked) if market_caps[s] else s for s in symbols]
+    return ordered, market_caps, coverage
+
+
+def store_ranking(ordered, market_caps):
+    """Replace the stored ranking"""
+    ranked_at = timezone.now()
+    rows = [
+        CapBucket(symbol=symbol, rank=rank, bucket=cap_bucket(rank), market_cap=market_caps.get(symbol), ranked_at=ranked_at)
+        for rank, symbol in enumerate(ordered)
+    ]
+    with transaction.atomic():
+        CapBucket.objects.all().delete()
+        CapBucket.objects.bulk_create(rows)
+
+
+def build_ranking(metadata_by_yfinance_symbol):
+    """
+    Rank the universe from {yfinance symbol: metadata}, storing the ranking when coverage suffices.
+
+    Returns ({symbol: cap bucket}, coverage, stored); below the coverage
+    threshold the index is the stocks_list order and nothing is stored.
+    """
+    metadata = {symbol: metadata_by_yfinance_symbol.get(to_yfinance_symbol(symbol), {}) for symbol in universe()}
+    ordered, market_caps, coverage = rank_by_market_cap(metadata)
+    if coverage < settings.CAP_INDEX_MIN_COVERAGE:
+        return build_cap_index(stocks), coverage, False
+    store_ranking(ordered, market_caps)
+    return build_cap_index(ordered), coverage, True
+
+
+def load_ranking():
+    """(stored {symbol: cap bucket}, ranked_at), or (None, None) if nothing is stored"""
+    rows = list(CapBucket.objects.values_list("symbol", "bucket", "ranked_at"))
+    if not rows:
+        return None, None
+    return {symbol: bucket for symbol, bucket, _ in rows}, min(ranked_at for _, _, ranked_at in rows)
+
+
+class CapClassifier:
+    def __init__(self):
+        self._index = build_cap_index(stocks)
+        self.source = "stocks_list"
+        self.ranked_at = None
+        self._next_load = 0
+        self._lock = threading.Lock()
+
+    def get_index(self):
+        """Current {symbol: cap bucket} index, reloaded from the table first if it is due"""
+        if time.monotonic() >= self._next_load and self._lock.acquire(blocking=False):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ Backend: Cap index reload failed: {e}")
+                self._next_load = time.monotonic() + settings.CAP_INDEX_RETRY_INTERVAL
+            finally:
+                self._lock.release()
+        return self._index
+
+    def reload(self):
+        """Use the stored ranking, or the stocks_list order while nothing is stored"""
+        stored, ranked_at = load_ranking()
+        if not stored:
+            self._install(build_cap_index(stocks), "stocks_list", None)
+            self._next_load = time.monotonic() + settings.CAP_INDEX_RETRY_INTERVAL
+            return self._index
+
+        if timezone.now() - ranked_at >= timedelta(seconds=settings.CAP_INDEX_REBUILD_INTERVAL):
+            # A stale market-cap ranking still beats the hand-maintained order
+            print(f"⚠️ Backend: Cap index was ranked at {ranked_at}; is build_cap_index scheduled?")
+        self._install(stored, "market_cap", ranked_at)
+        self._next_load = time.monotonic() + settings.CAP_INDEX_RELOAD_INTERVAL
+        return self._index
+
+    def _install(self, index, source, ranked_at):
+        self._index, self.source, self.ranked_at = index, source, ranked_at
+        # Scoring calls that do not pass an index use the same one
+        install_cap_index(index)
+
+
+cap_classifier = CapClassifier()
+
+
+def get_cap_index():
+    return cap_classifier.get_index()
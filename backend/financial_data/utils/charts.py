@@ -0,0 +1,113 @@
+import pandas as pd
+
+from financial_data.utils import price_store
+from financial_data.utils.analytics import BENCHMARK_SYMBOL, compute_period_metrics
+from financial_data.utils.downsampling import lttb_indices
+from financial_data.utils.quote_cache import get_quotes
+
+
+# Chart periods served by get_stock_data, mapped to how far back each one reaches.
+PERIODS = {
+    "7d": pd.DateOffset(days=7),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+}
+
+
+def period_cutoff(period_name, tz=None):
+    """First date included in `period_name`, counted back from today."""
+    return pd.Timestamp.now(tz=tz).normalize() - PERIODS[period_name]
+
+
+def slice_period(hist, period_name):
+    """Return the rows of `hist` that fall inside `period_name`, counted back from today."""
+    if hist.empty:
+        return hist
+    return hist[hist.index >= period_cutoff(period_name, hist.index.tz)]
+
+
+def build_period_data(hist, live_price, metrics, max_points=None):
+    """
+    Build the per-period chart payload from a price frame and its precomputed metrics.
+
+    With `max_points`, history/dates are downsampled (LTTB) for drawing only;
+    prices, metrics and data_points still describe the full series.
+    """
+    closes = hist["Close"]
+    chart_points = hist
+    if max_points and len(hist) > max_points:
+        days = hist.index.values.astype("datetime64[D]").astype("i8")
+        chart_points = hist.iloc[lttb_indices(days, closes.to_numpy(), max_points)]
+    return {
+        "current_price": live_price,
+        "history": chart_points["Close"].tolist(),
+        "dates": chart_points.index.strftime("%Y-%m-%d").tolist(),
+        "start_price": closes.iloc[0],
+        "end_price": closes.iloc[-1],
+        **metrics,
+        "data_points": len(hist),
+    }
+
+
+def load_chart_inputs(symbols, periods=None):
+    """
+    Gather everything a chart response is built from, for a batch of symbols.
+
+    History is read from the local price store (which only downloads bars it is
+    missing); live prices come from the shared quote cache. Metrics for all
+    symbols and periods come from one aligned analytics pass, with the
+    benchmark added for beta. Returns {symbol: {"history", "current_price",
+    "metrics": {period: {...}}}}; symbols without history are left out.
+    """
+    periods = periods or list(PERIODS)
+    history = price_store.get_history(list(symbols) + [BENCHMARK_SYMBOL])
+    history = {
+        symbol: hist.dropna(subset=["Close"])
+        for symbol, hist in history.items()
+        if not hist["Close"].dropna().empty
+    }
+    live_prices = get_quotes([symbol for symbol in symbols if symbol in history])
+    metrics = compute_period_metrics(history, {name: period_cutoff(name) for name in periods})
+
+    inputs = {}
+    for symbol in symbols:
+        hist = history.get(symbol)
+        if hist is None:
+            print(f"⚠️ Backend: No historical data for {symbol}")
+            continue
+        inputs[symbol] = {
+            "history": hist,
+            "current_price": live_prices.get(symbol, hist["Close"].iloc[-1]),
+            "metrics": metrics[symbol],
+        }
+    return inputs
+
+
+def build_chart_data(inputs, periods=None, max_points=None):
+    """
+    Build the per-symbol, per-period chart response from load_chart_inputs output.
+
+    Each period is sliced out of the symbol's history in memory. `max_points`
+    caps the number of points drawn per series (see build_period_data).
+    Returns {symbol: {period: payload}}.
+    """
+    periods = periods or list(PERIODS)
+    chart_data = {}
+    for symbol, symbol_inputs in inputs.items():
+        hist = symbol_inputs["history"]
+        period_data = {}
+        for period_name in periods:
+            period_hist = slice_period(hist, period_name)
+            if period_hist.empty:
+                print(f"⚠️ Backend: No {period_name} historical data for {symbol}")
+                continue
+            period_data[period_name] = build_period_data(
+                period_hist, symbol_inputs["current_price"], symbol_inputs["metrics"][period_name], max_points
+            )
+        if period_data:
+            chart_data[symbol] = period_data
+    return chart_data
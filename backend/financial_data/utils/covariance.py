@@ -0,0 +1,142 @@
+"""
+Covariance and correlation of holdings' daily returns.
+
+Statistics are pairwise-complete (each pair uses the days both symbols
+traded) over a calendar window ending at the as-of date, which makes every
+pair independent of the other symbols in the request. Results are memoized by
+(symbol set, window, as-of date), and a request for a superset of a memoized
+set only computes the rows of the symbols that were added.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from financial_data.utils import price_store
+from financial_data.utils.analytics import align_closes, daily_returns
+
+
+_memo = OrderedDict()  # (frozenset(symbols), window, as_of) -> (symbols, pair sums)
+_memo_lock = threading.Lock()
+
+
+def _window_returns(symbols, window, as_of):
+    """Aligned returns (symbols x dates) inside (as_of - window days, as_of]"""
+    history = price_store.get_history(symbols)
+    ordered = [symbol for symbol in symbols if symbol in history]
+    _, dates, closes = align_closes({symbol: history[symbol] for symbol in ordered})
+    returns = daily_returns(closes)
+    start = pd.Timestamp(as_of - timedelta(days=window))
+    in_window = (dates > start) & (dates <= pd.Timestamp(as_of))
+    return ordered, dates[in_window], returns[:, in_window]
+
+
+def _pair_sums(rows, columns, rows_mask, columns_mask):
+    """
+    Sufficient statistics for pairwise-complete covariance between two sets of series.
+
+    Returns (n, sum_row, sum_col, sum_sq_row, sum_sq_col, sum_cross), each of
+    shape (len(rows), len(columns)), counted over the days both series traded.
+    """
+    mask_r = rows_mask.astype("f8")
+    mask_c = columns_mask.astype("f8")
+    x = np.where(rows_mask, rows, 0.0)
+    y = np.where(columns_mask, columns, 0.0)
+    return (
+        mask_r @ mask_c.T,
+        x @ mask_c.T,
+        mask_r @ y.T,
+        (x * x) @ mask_c.T,
+        mask_r @ (y * y).T,
+        x @ y.T,
+    )
+
+
+def _from_sums(sums):
+    n, s_r, s_c, q_r, q_c, cross = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = np.where(n > 1, n - 1, np.nan)
+        covariance = (cross - s_r * s_c / n) / denominator
+        var_r = (q_r - s_r * s_r / n) / denominator
+        var_c = (q_c - s_c * s_c / n) / denominator
+        correlation = covariance / np.sqrt(var_r * var_c)
+    return covariance, correlation
+
+
+def _find_subset(symbol_set, window, as_of):
+    """Largest memoized symbol set for the same window/as-of contained in `symbol_set`"""
+    best = None
+    with _memo_lock:
+        for (cached_set, cached_window, cached_as_of), value in _memo.items():
+            if cached_window == window and cached_as_of == as_of and cached_set <= symbol_set:
+                if best is None or len(cached_set) > len(best[0]):
+                    best = (cached_set, value)
+    return best
+
+
+def _remember(key, value):
+    with _memo_lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > settings.CORRELATION_MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def _assemble(symbols, cached_symbols, cached_sums, returns, mask):
+    """Full sufficient statistics for `symbols`, reusing the block already computed for `cached_symbols`"""
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    old = np.array([position[symbol] for symbol in cached_symbols], dtype=int)
+    new = np.array([i for i, symbol in enumerate(symbols) if symbol not in cached_symbols], dtype=int)
+
+    size = len(symbols)
+    full = [np.empty((size, size)) for _ in range(6)]
+    for stat, cached in zip(full, cached_sums):
+        stat[np.ix_(old, old)] = cached
+    if len(new):
+        # Only the rows of added symbols (against everything) are computed
+        new_rows = _pair_sums(returns[new], returns, mask[new], mask)
+        for stat, block in zip(full, new_rows):
+            stat[new, :] = block
+        # The transposed block fills the columns; row/column roles swap in the sums
+        n, s_r, s_c, q_r, q_c, cross = new_rows
+        for stat, block in zip(full, (n, s_c, s_r, q_c, q_r, cross)):
+            stat[:, new] = block.T
+    return full
+
+
+def covariance_matrices(symbols, window, as_of):
+    """
+    Pairwise covariance and correlation of daily returns over `window` calendar days.
+
+    Returns (symbols with history, covariance, correlation) with the matrices as
+    NumPy arrays (NaN where a pair has fewer than two common observations).
+    """
+    symbols = sorted(set(symbols))
+    key = (frozenset(symbols), window, as_of)
+    with _memo_lock:
+        cached = _memo.get(key)
+    if cached is None:
+        ordered, _, returns = _window_returns(symbols, window, as_of)
+        mask = ~np.isnan(returns)
+        subset = _find_subset(frozenset(ordered), window, as_of)
+        if subset is not None and len(subset[0]):
+            cached_symbols, cached_sums = subset[1]
+            sums = _assemble(ordered, cached_symbols, cached_sums, returns, mask)
+        else:
+            sums = list(_pair_sums(returns, returns, mask, mask))
+        cached = (ordered, sums)
+        _remember(key, cached)
+        if frozenset(ordered) != key[0]:
+            _remember((frozenset(ordered), window, as_of), cached)
+
+    ordered, sums = cached
+    covariance, correlation = _from_sums(sums)
+    return ordered, covariance, correlation
+
+
+def matrix_to_list(matrix, digits=8):
+    """JSON-friendly nested lists, with NaN as None"""
+    return [[None if np.isnan(value) else round(float(value), digits) for value in row] for row in matrix]
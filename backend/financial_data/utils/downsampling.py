@@ -0,0 +1,46 @@
+import numpy as np
+
+
+# Anything smaller cannot keep both endpoints plus a point per bucket
+MIN_POINTS = 3
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: pick `max_points` indices that preserve the shape of y(x).
+
+    The first and last points are always kept; the rest of the series is split
+    into equal buckets and from each bucket the point forming the largest
+    triangle with the previously kept point and the next bucket's average wins.
+    Returns a sorted index array (all indices when no downsampling is needed).
+    """
+    n = len(y)
+    if max_points >= n or max_points < MIN_POINTS:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="f8")
+    y = np.asarray(y, dtype="f8")
+    # Bucket edges over the interior points 1..n-2
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area for every candidate in the bucket at once
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
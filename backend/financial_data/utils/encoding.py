@@ -0,0 +1,99 @@
+"""
+Compact, columnar encoding of chart data.
+
+Instead of repeating every period's closes and "YYYY-MM-DD" strings per
+symbol, the compact form sends one shared date axis and one price series per
+symbol, and describes each period as an index range into them:
+
+    {
+      "encoding": "compact",
+      "dates": [d0, d1 - d0, d2 - d1, ...],   # epoch days, delta-encoded
+      "price_scale": 100,                     # prices are integers of 1/price_scale
+      "symbols": {
+        "TCS.NS": {
+          "offset": 3,                        # axis index of the first price
+          "prices": [p0, p1 - p0, ...],       # delta-encoded; null = no bar that day
+          "current_price": 4123.5,
+          "periods": {"1mo": {"range": [start, end], "total_return": ..., ...}}
+        }
+      }
+    }
+
+To decode: cumulative-sum `dates` to get epoch days, cumulative-sum the
+non-null `prices` (nulls do not reset the running total) and divide by
+`price_scale`; a symbol's price at axis index i is prices[i - offset]. A
+period's dates and prices are axis indices range[0] <= i < range[1].
+"""
+import numpy as np
+import pandas as pd
+
+
+PRICE_PRECISION = 2
+
+
+def _epoch_days(index):
+    return index.values.astype("datetime64[D]").astype("i8")
+
+
+def _delta_encode(values):
+    """Delta-encode an int array that may contain None; deltas are taken between non-null values."""
+    encoded = [None] * len(values)
+    previous = 0
+    for i, value in enumerate(values):
+        if value is not None:
+            encoded[i] = value - previous
+            previous = value
+    return encoded
+
+
+def encode_compact(inputs, period_cutoffs):
+    """
+    Encode load_chart_inputs output (merged across batches) in the compact format.
+
+    `period_cutoffs` maps period name -> first date included in that period.
+    Series are sent in full; downsampling does not apply to this encoding.
+    """
+    scale = 10 ** PRICE_PRECISION
+    if not inputs:
+        return {"encoding": "compact", "dates": [], "price_scale": scale, "symbols": {}}
+
+    axis = pd.DatetimeIndex(sorted(set().union(*(item["history"].index for item in inputs.values()))))
+    axis_days = _epoch_days(axis)
+
+    symbols = {}
+    for symbol, item in inputs.items():
+        closes = item["history"]["Close"]
+        positions = axis.get_indexer(closes.index)
+        offset, end = int(positions[0]), int(positions[-1]) + 1
+
+        scaled = [None] * (end - offset)
+        for position, price in zip(positions, np.rint(closes.to_numpy() * scale).astype("i8")):
+            scaled[position - offset] = int(price)
+
+        periods = {}
+        for period_name, cutoff in period_cutoffs.items():
+            start = max(int(axis.searchsorted(cutoff)), offset)
+            if start >= end:
+                continue
+            period_closes = closes[closes.index >= axis[start]]
+            periods[period_name] = {
+                "range": [start, end],
+                "start_price": period_closes.iloc[0],
+                "end_price": period_closes.iloc[-1],
+                **item["metrics"].get(period_name, {}),
+                "data_points": len(period_closes),
+            }
+
+        symbols[symbol] = {
+            "offset": offset,
+            "prices": _delta_encode(scaled),
+            "current_price": item["current_price"],
+            "periods": periods,
+        }
+
+    return {
+        "encoding": "compact",
+        "dates": _delta_encode([int(day) for day in axis_days]),
+        "price_scale": scale,
+        "symbols": symbols,
+    }
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+
+def fan_out(func, items, max_workers=None, item_timeout=None, deadline=None):
+    """
+    Run `func(item)` for every item on a bounded thread pool.
+
+    Each item gets `item_timeout` seconds from the moment it starts running and
+    the whole call returns after at most `deadline` seconds. Work that fails or
+    overruns is abandoned rather than awaited (its thread finishes in the
+    background). Returns (results {item: value}, failed [item]) with `failed`
+    in input order.
+    """
+    max_workers = max_workers or settings.MARKET_DATA_MAX_WORKERS
+    item_timeout = item_timeout or settings.MARKET_DATA_SYMBOL_TIMEOUT
+    deadline = deadline or settings.MARKET_DATA_REQUEST_DEADLINE
+
+    items = list(dict.fromkeys(items))
+    results, failed = {}, set()
+    if not items:
+        return results, []
+
+    started = {}
+
+    def run(item):
+        started[item] = time.monotonic()
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="market-data")
+    futures = {executor.submit(run, item): item for item in items}
+    pending = set(futures)
+    deadline_at = time.monotonic() + deadline
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= deadline_at:
+                print(f"⚠️ Backend: Request deadline of {deadline}s reached with {len(pending)} fetches pending")
+                break
+
+            # Wake up at the next completion, per-item expiry or the overall deadline
+            expiries = [started[futures[f]] + item_timeout for f in pending if futures[f] in started]
+            wake_at = min(expiries + [deadline_at])
+            done, pending = wait(pending, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                item = futures[future]
+                try:
+                    results[item] = future.result()
+                except Exception as e:
+                    print(f"⚠️ Backend: Fetch failed for {item}: {e}")
+                    failed.add(item)
+
+            now = time.monotonic()
+            timed_out = {f for f in pending if futures[f] in started and now - started[futures[f]] >= item_timeout}
+            for future in timed_out:
+                print(f"⚠️ Backend: Fetch for {futures[future]} timed out after {item_timeout}s")
+                failed.add(futures[future])
+            pending -= timed_out
+    finally:
+        failed.update(futures[f] for f in pending)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, [item for item in items if item in failed]
@@ -0,0 +1,81 @@
+"""
+Daily holdings snapshots and the portfolio value series built from them.
+
+`record_snapshots` is run once a day (after the close) by
+`manage.py snapshot_holdings`: it fetches every linked user's holdings
+concurrently, clears those users' rows for the day and writes all rows with
+bulk inserts, so re-running it for the same day replaces that day's rows
+instead of duplicating them.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from financial_data.models import HoldingSnapshot
+from financial_data.utils.fetch_executor import fan_out
+from financial_data.utils.holdings_cache import get_holdings
+from financial_data.utils.symbols import to_yfinance_symbol
+
+
+def snapshot_rows(user, holdings, date):
+    """HoldingSnapshot instances (unsaved) for a user's delivery holdings"""
+    rows = {}
+    for holding in holdings:
+        if holding['product'] != 'CNC':  # delivery holdings only
+            continue
+        symbol = to_yfinance_symbol(holding['tradingsymbol'], holding.get('exchange'))
+        rows[symbol] = HoldingSnapshot(
+            user=user,
+            date=date,
+            symbol=symbol,
+            quantity=holding['quantity'],
+            price=holding['last_price'],
+            value=holding['quantity'] * holding['last_price'],
+        )
+    return list(rows.values())
+
+
+def record_snapshots(zerodha_users, date, batch_size=1000, deadline=None):
+    """
+    Snapshot every user's holdings for `date`.
+
+    `deadline` bounds the whole fetch; it defaults to one second per user plus
+    a minute, since this is a batch job rather than a request.
+    Returns (rows written, users whose holdings could not be fetched).
+    """
+    zerodha_users = list(zerodha_users)
+    by_id = {zerodha_user.id: zerodha_user for zerodha_user in zerodha_users}
+    holdings, failed = fan_out(
+        lambda zerodha_user_id: get_holdings(by_id[zerodha_user_id]),
+        list(by_id),
+        deadline=deadline or len(by_id) + 60,
+    )
+
+    rows = []
+    for zerodha_user_id, user_holdings in holdings.items():
+        rows.extend(snapshot_rows(by_id[zerodha_user_id].user, user_holdings, date))
+
+    # Users whose fetch failed keep whatever an earlier run recorded for the day
+    fetched_user_ids = [by_id[zerodha_user_id].user_id for zerodha_user_id in holdings]
+    with transaction.atomic():
+        # Replacing the fetched users' rows for the day also drops positions sold since an earlier run
+        for start in range(0, len(fetched_user_ids), batch_size):
+            HoldingSnapshot.objects.filter(
+                date=date, user_id__in=fetched_user_ids[start:start + batch_size]
+            ).delete()
+        HoldingSnapshot.objects.bulk_create(rows, batch_size=batch_size)
+
+    return len(rows), [by_id[zerodha_user_id] for zerodha_user_id in failed]
+
+
+def portfolio_value_series(user, start=None, end=None):
+    """[{date, value, holdings}] of the user's total snapshot value per day, oldest first"""
+    snapshots = HoldingSnapshot.objects.filter(user=user)
+    if start:
+        snapshots = snapshots.filter(date__gte=start)
+    if end:
+        snapshots = snapshots.filter(date__lte=end)
+    return list(
+        snapshots.values('date')
+        .annotate(value=Sum('value'), holdings=Count('id'))
+        .order_by('date')
+    )
@@ -0,0 +1,45 @@
+"""
+Short-lived per-user snapshot of Zerodha equity holdings.
+
+The dashboard hits several endpoints that all need kite.holdings() within a
+second of each other; they read through this cache so Zerodha sees one call
+per user per HOLDINGS_CACHE_TTL. Concurrent misses for the same user wait on
+a striped lock and then find the snapshot the first request stored.
+Snapshots are dropped when the account is re-linked or disconnected.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from financial_data.utils.kite_clients import get_kite_client
+from financial_data.utils.quote_stream import track_holdings
+
+
+_LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+def _key(user_id):
+    return f"kite_holdings_{user_id}"
+
+
+def get_holdings(zerodha_user):
+    """kite.holdings() for this user, served from the snapshot cache when fresh"""
+    key = _key(zerodha_user.user_id)
+    holdings = cache.get(key)
+    if holdings is not None:
+        return holdings
+    with _locks[zerodha_user.user_id % _LOCK_STRIPES]:
+        holdings = cache.get(key)
+        if holdings is not None:
+            return holdings
+        holdings = get_kite_client(zerodha_user.access_token).holdings()
+        cache.set(key, holdings, timeout=settings.HOLDINGS_CACHE_TTL)
+    # Outside the lock, so users sharing the stripe are not held up by the ticker
+    track_holdings(zerodha_user.access_token, holdings)
+    return holdings
+
+
+def invalidate_holdings(user_id):
+    cache.delete(_key(user_id))
@@ -0,0 +1,165 @@
+"""
+Instrument master: the Kite instruments dump as a table plus an in-memory index.
+
+`manage.py load_instruments` (scheduled daily, before the open) replaces the
+`instrument` table with the cash-segment rows of the dump, fetched from Kite
+or read from a local CSV copy (settings.INSTRUMENTS_CSV). Nothing else
+downloads the dump.
+
+Every process keeps a dict index of the table. Every
+INSTRUMENTS_RELOAD_INTERVAL seconds a lookup checks the table's load time
+(one row) and, if a new load landed, rebuilds the index in a background
+thread; until then, and while the table is empty, lookups miss and callers
+fall back to the exchange suffix rule.
+"""
+import csv
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from kiteconnect import KiteConnect
+
+from config import KITE_API_KEY
+from financial_data.models import Instrument
+
+
+YFINANCE_SUFFIXES = {"NSE": ".NS", "BSE": ".BO"}
+
+# Series Zerodha appends to symbols traded outside the regular EQ series
+# (BE/BZ trade-for-trade, SM/ST SME, etc.). Hyphenated names like BAJAJ-AUTO are untouched.
+SERIES_SUFFIXES = ("-BE", "-BZ", "-BL", "-SM", "-ST", "-IL", "-IT", "-GB", "-GS", "-E1")
+
+InstrumentInfo = namedtuple(
+    "InstrumentInfo",
+    ["instrument_token", "tradingsymbol", "exchange", "segment", "lot_size", "tick_size", "yfinance_symbol"],
+)
+
+
+def strip_series(tradingsymbol):
+    for suffix in SERIES_SUFFIXES:
+        if tradingsymbol.endswith(suffix):
+            return tradingsymbol[:-len(suffix)]
+    return tradingsymbol
+
+
+def yfinance_symbol_for(tradingsymbol, exchange):
+    """yfinance ticker of a cash-segment listing"""
+    return strip_series(tradingsymbol.upper()) + YFINANCE_SUFFIXES.get(exchange, ".NS")
+
+
+def fetch_instrument_rows(csv_path=None):
+    """Rows of the instruments dump for settings.INSTRUMENT_EXCHANGES, from `csv_path` or from Kite"""
+    if csv_path:
+        with open(csv_path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        return [row for row in rows if row["exchange"] in settings.INSTRUMENT_EXCHANGES]
+
+    kite_client = KiteConnect(api_key=KITE_API_KEY)
+    rows = []
+    for exchange in settings.INSTRUMENT_EXCHANGES:
+        rows.extend(kite_client.instruments(exchange))
+    return rows
+
+
+def load_instruments(rows, batch_size=2000):
+    """Replace the instrument table with the cash-segment rows of a dump; returns the row count"""
+    loaded_at = timezone.now()
+    instruments = [
+        Instrument(
+            instrument_token=int(row["instrument_token"]),
+            exchange_token=int(row["exchange_token"]),
+            tradingsymbol=row["tradingsymbol"],
+            name=row.get("name") or "",
+            exchange=row["exchange"],
+            segment=row["segment"],
+            instrument_type=row["instrument_type"],
+            lot_size=int(row["lot_size"] or 1),
+            tick_size=float(row["tick_size"] or 0.05),
+            yfinance_symbol=yfinance_symbol_for(row["tradingsymbol"], row["exchange"]),
+            loaded_at=loaded_at,
+        )
+        # Cash segment only; F&O, currency and index rows never map to a yfinance equity
+        for row in rows
+        if row["segment"] == row["exchange"]
+    ]
+    with transaction.atomic():
+        Instrument.objects.all().delete()
+        Instrument.objects.bulk_create(instruments, batch_size=batch_size)
+    return len(instruments)
+
+
+def refresh_instruments(csv_path=None):
+    count = load_instruments(fetch_instrument_rows(csv_path or settings.INSTRUMENTS_CSV))
+    instrument_index.invalidate()
+    return count
+
+
+class InstrumentIndex:
+    def __init__(self):
+        self._by_key = {}  # (exchange, tradingsymbol) -> InstrumentInfo
+        self._by_symbol = {}  # tradingsymbol -> InstrumentInfo, NSE listing preferred
+        self._loaded_at = None  # loaded_at of the rows the index was built from
+        self._checked_at = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def lookup(self, tradingsymbol, exchange=None):
+        """InstrumentInfo for a trading symbol, or None if the master does not list it (or is not loaded yet)"""
+        self._ensure_loaded()
+        tradingsymbol = tradingsymbol.upper()
+        if exchange:
+            instrument = self._by_key.get((exchange.upper(), tradingsymbol))
+            if instrument:
+                return instrument
+        return self._by_symbol.get(tradingsymbol) or self._by_symbol.get(strip_series(tradingsymbol))
+
+    def invalidate(self):
+        self._checked_at = None
+
+    def _ensure_loaded(self):
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < settings.INSTRUMENTS_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            if self._checked_at is not checked_at:
+                return
+            self._checked_at = time.monotonic()
+            # A load gives every row the same loaded_at, so one row tells whether the table changed
+            loaded_at = Instrument.objects.values_list("loaded_at", flat=True).first()
+            if loaded_at is None:
+                self._by_key, self._by_symbol, self._loaded_at = {}, {}, None
+            elif loaded_at != self._loaded_at and not self._reloading:
+                self._reloading = True
+                self._start_reload(loaded_at)
+
+    def _start_reload(self, loaded_at):
+        threading.Thread(target=self._reload, args=(loaded_at,), name="instrument-reload", daemon=True).start()
+
+    def _reload(self, loaded_at):
+        try:
+            by_key, by_symbol = {}, {}
+            rows = Instrument.objects.values_list(
+                "instrument_token", "tradingsymbol", "exchange", "segment", "lot_size", "tick_size", "yfinance_symbol"
+            )
+            for row in rows.iterator(chunk_size=5000):
+                instrument = InstrumentInfo(*row)
+                by_key[(instrument.exchange, instrument.tradingsymbol)] = instrument
+                if instrument.tradingsymbol not in by_symbol or instrument.exchange == "NSE":
+                    by_symbol[instrument.tradingsymbol] = instrument
+                base = strip_series(instrument.tradingsymbol)
+                if base != instrument.tradingsymbol:
+                    by_symbol.setdefault(base, instrument)
+            # Readers see either the old or the new dicts, never a half-built one
+            self._by_key, self._by_symbol, self._loaded_at = by_key, by_symbol, loaded_at
+        except Exception as e:
+            print(f"⚠️ Backend: Instrument index reload failed: {e}")
+            self.invalidate()
+        finally:
+            self._reloading = False
+            close_old_connections()
+
+
+instrument_index = InstrumentIndex()
@@ -0,0 +1,81 @@
+"""
+Per-access-token KiteConnect clients.
+
+A KiteConnect object carries one access token and one requests session, so
+sharing a single client across users means calling set_access_token on every
+request and racing other threads doing the same. The pool hands every token
+its own client (and with it its own keep-alive connection pool) and drops
+clients that have not been used for KITE_CLIENT_IDLE_TIMEOUT seconds.
+"""
+import threading
+import time
+
+from django.conf import settings
+from kiteconnect import KiteConnect
+
+from config import KITE_API_KEY
+
+
+class KiteClientPool:
+    def __init__(self, api_key, idle_timeout, http_pool=None):
+        self.api_key = api_key
+        self.idle_timeout = idle_timeout
+        self.http_pool = http_pool
+        self._clients = {}  # access_token -> (client, last_used)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, access_token):
+        """Client bound to `access_token`, created on first use"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(access_token)
+            client = entry[0] if entry else KiteConnect(
+                api_key=self.api_key, access_token=access_token, pool=self.http_pool
+            )
+            self._clients[access_token] = (client, now)
+        return client
+
+    def discard(self, access_token):
+        """Drop the client for a token that was revoked or expired"""
+        with self._lock:
+            entry = self._clients.pop(access_token, None)
+        if entry:
+            entry[0].reqsession.close()
+
+    def _evict_idle(self, now):
+        # Sweeping at most once per idle period keeps get() O(1) amortized
+        if now - self._last_sweep < self.idle_timeout:
+            return
+        self._last_sweep = now
+        idle = [token for token, (_, last_used) in self._clients.items() if now - last_used > self.idle_timeout]
+        for token in idle:
+            client, _ = self._clients.pop(token)
+            client.reqsession.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_kite_client(access_token):
+    """Pooled KiteConnect client for `access_token`"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = KiteClientPool(
+                    KITE_API_KEY,
+                    idle_timeout=settings.KITE_CLIENT_IDLE_TIMEOUT,
+                    http_pool={
+                        "pool_connections": settings.KITE_HTTP_POOL_SIZE,
+                        "pool_maxsize": settings.KITE_HTTP_POOL_SIZE,
+                    },
+                )
+    return _pool.get(access_token)
+
+
+def discard_kite_client(access_token):
+    if _pool is not None:
+        _pool.discard(access_token)
@@ -0,0 +1,79 @@
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+
+
+# Longest window we ever need; every shorter period is sliced out of it.
+MAX_PERIOD = "5y"
+
+
+def batches(symbols, batch_size=None):
+    """Split `symbols` into lists of at most MARKET_DATA_BATCH_SIZE"""
+    batch_size = batch_size or settings.MARKET_DATA_BATCH_SIZE
+    for i in range(0, len(symbols), batch_size):
+        yield symbols[i:i + batch_size]
+
+
+def _split_by_symbol(frame, symbols):
+    """Split a multi-ticker yf.download frame into {symbol: OHLCV frame}"""
+    result = {}
+    if frame is None or frame.empty:
+        return result
+    for symbol in symbols:
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(0):
+                continue
+            symbol_frame = frame[symbol]
+        else:
+            # Older yfinance returns flat columns for a single ticker
+            symbol_frame = frame
+        symbol_frame = symbol_frame.dropna(how="all")
+        if not symbol_frame.empty:
+            result[symbol] = symbol_frame
+    return result
+
+
+def bulk_download(symbols, period=MAX_PERIOD, interval="1d", **kwargs):
+    """
+    Download OHLCV for many symbols with one bulk request per batch.
+
+    Returns ({symbol: DataFrame}, failed symbols). Symbols yfinance had no data
+    for are left out of both; symbols whose batch request raised are failed.
+    Any extra keyword arguments (e.g. start/end) are passed to yf.download.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    history = {}
+    failed = []
+    for batch in batches(symbols):
+        try:
+            frame = yf.download(
+                batch,
+                period=None if "start" in kwargs else period,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=True,
+                progress=False,
+                **kwargs,
+            )
+        except Exception as e:
+            print(f"⚠️ Backend: Bulk download failed for {batch}: {e}")
+            failed.extend(batch)
+            continue
+        history.update(_split_by_symbol(frame, batch))
+    return history, failed
+
+
+def download_history(symbols, period=MAX_PERIOD, interval="1d", **kwargs):
+    """bulk_download without the failed symbols: {symbol: DataFrame}"""
+    return bulk_download(symbols, period=period, interval=interval, **kwargs)[0]
+
+
+def get_live_prices(symbols):
+    """Latest 1-minute close for each symbol, fetched in bulk. Missing symbols are left out."""
+    intraday = download_history(symbols, period="1d", interval="1m")
+    return {
+        symbol: frame["Close"].dropna().iloc[-1]
+        for symbol, frame in intraday.items()
+        if not frame["Close"].dropna().empty
+    }
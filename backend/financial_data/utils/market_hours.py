@@ -0,0 +1,47 @@
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.conf import settings
+
+
+IST = pytz.timezone("Asia/Kolkata")
+
+# NSE cash market session (IST)
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+
+
+def now_ist():
+    return datetime.now(IST)
+
+
+def is_trading_day(day):
+    """Weekdays that are not listed in settings.NSE_HOLIDAYS"""
+    return day.weekday() < 5 and day.isoformat() not in settings.NSE_HOLIDAYS
+
+
+def is_market_open(now=None):
+    now = now or now_ist()
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def next_market_open(now=None):
+    """Datetime (IST) of the next session open strictly after `now`"""
+    now = now or now_ist()
+    day = now.date()
+    if now.time() >= MARKET_OPEN:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return IST.localize(datetime.combine(day, MARKET_OPEN))
+
+
+def session_date(now=None):
+    """Date of the most recent trading session that has already opened"""
+    now = now or now_ist()
+    day = now.date()
+    if now.time() < MARKET_OPEN:
+        day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
@@ -0,0 +1,180 @@
+"""
+Local on-disk store of daily OHLCV bars, one file per symbol.
+
+Each file is a flat array of fixed-size records (see RECORD_DTYPE) sorted by
+date, so it can be memory-mapped straight into NumPy and new bars are appended
+in place. Syncing only downloads the bars after the last stored date; the last
+stored bar is rewritten because today's bar keeps changing until the close, and
+a symbol is rebuilt from scratch when upstream re-adjusts its history.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from financial_data.utils.market_data import MAX_PERIOD, bulk_download
+
+
+RECORD_DTYPE = np.dtype([
+    ("date", "<i4"),  # days since 1970-01-01
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+# Relative change in a completed bar's close that means upstream re-adjusted history
+ADJUSTMENT_TOLERANCE = 1e-4
+
+_write_lock = threading.Lock()
+
+
+def _path(symbol):
+    filename = symbol.upper().replace(os.sep, "_") + ".bin"
+    return os.path.join(settings.PRICE_STORE_DIR, filename)
+
+
+def read(symbol):
+    """Memory-map the stored bars for `symbol`; returns an empty array if nothing is stored."""
+    path = _path(symbol)
+    if not os.path.exists(path) or os.path.getsize(path) < RECORD_DTYPE.itemsize:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+
+def to_frame(records):
+    """Convert stored records to a yfinance-shaped OHLCV DataFrame indexed by date."""
+    index = pd.DatetimeIndex(np.asarray(records["date"]).astype("datetime64[D]"), name="Date")
+    return pd.DataFrame(
+        {column: np.asarray(records[field]) for field, column in _COLUMNS.items()},
+        index=index,
+    )
+
+
+def _to_records(frame):
+    frame = frame.dropna(subset=["Close"])
+    index = frame.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    records = np.empty(len(frame), dtype=RECORD_DTYPE)
+    records["date"] = index.values.astype("datetime64[D]").astype(np.int64)
+    for field, column in _COLUMNS.items():
+        records[field] = frame[column].to_numpy(dtype="f8") if column in frame else np.nan
+    return records
+
+
+def _write(symbol, frame):
+    """Append bars newer than the last stored date, rewriting the last stored bar in place."""
+    new_records = _to_records(frame)
+    path = _path(symbol)
+    with _write_lock:
+        existing = read(symbol)
+        count = len(existing)
+        if count:
+            last_date = int(existing["date"][-1])
+            del existing
+            new_records = new_records[new_records["date"] >= last_date]
+            offset = count - 1 if len(new_records) and new_records["date"][0] == last_date else count
+        else:
+            offset = 0
+
+        os.makedirs(settings.PRICE_STORE_DIR, exist_ok=True)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset * RECORD_DTYPE.itemsize)
+            f.write(new_records.tobytes())
+        # The file mtime doubles as the "last synced" marker, even when nothing new arrived
+        os.utime(path)
+
+
+def _is_fresh(symbol):
+    path = _path(symbol)
+    if not os.path.exists(path):
+        return False
+    return time.time() - os.path.getmtime(path) < settings.PRICE_STORE_SYNC_INTERVAL
+
+
+def _is_adjusted(records, frame):
+    """
+    True when upstream re-adjusted history (split/dividend) since we stored it.
+
+    The second-to-last stored bar is a completed session, so its close should
+    not change unless yfinance rescaled the whole series.
+    """
+    if len(records) < 2:
+        return False
+    fresh = _to_records(frame)
+    match = fresh[fresh["date"] == int(records["date"][-2])]
+    if not len(match):
+        return False
+    stored_close = float(records["close"][-2])
+    return not np.isclose(match["close"][0], stored_close, rtol=ADJUSTMENT_TOLERANCE)
+
+
+def sync(symbols):
+    """Bring the store up to date for `symbols`, downloading only missing bars."""
+    stale = [symbol for symbol in dict.fromkeys(symbols) if not _is_fresh(symbol)]
+    if not stale:
+        return
+
+    # Unseen symbols need the full window; known ones only need bars since their
+    # second-to-last date (one completed bar of overlap to detect re-adjustments)
+    new_symbols = []
+    resume_dates = {}
+    for symbol in stale:
+        records = read(symbol)
+        if len(records):
+            resume_dates[symbol] = int(records["date"][max(len(records) - 2, 0)])
+        else:
+            new_symbols.append(symbol)
+
+    downloaded = {}
+    failed = set()
+    if resume_dates:
+        start = np.datetime64(min(resume_dates.values()), "D")
+        print(f"🔍 Backend: Price store updating {list(resume_dates)} from {start}")
+        history, failed_symbols = bulk_download(list(resume_dates), start=str(start))
+        downloaded.update(history)
+        failed.update(failed_symbols)
+        for symbol in resume_dates:
+            frame = downloaded.get(symbol)
+            if frame is not None and _is_adjusted(read(symbol), frame):
+                print(f"🔍 Backend: Price store history for {symbol} was re-adjusted, rebuilding")
+                os.remove(_path(symbol))
+                new_symbols.append(symbol)
+                del downloaded[symbol]
+    if new_symbols:
+        print(f"🔍 Backend: Price store downloading {MAX_PERIOD} history for {new_symbols}")
+        history, failed_symbols = bulk_download(new_symbols, period=MAX_PERIOD)
+        downloaded.update(history)
+        failed.update(failed_symbols)
+
+    for symbol in stale:
+        frame = downloaded.get(symbol)
+        if frame is None:
+            # A failed download leaves the symbol stale so the next call retries it
+            if symbol not in failed and os.path.exists(_path(symbol)):
+                # Nothing new upstream (weekend/holiday); mark as synced anyway
+                os.utime(_path(symbol))
+            continue
+        try:
+            _write(symbol, frame)
+        except Exception as e:
+            print(f"⚠️ Backend: Price store write failed for {symbol}: {e}")
+
+
+def get_history(symbols):
+    """Sync `symbols` and return {symbol: OHLCV DataFrame} read from the local store."""
+    sync(symbols)
+    history = {}
+    for symbol in symbols:
+        records = read(symbol)
+        if len(records):
+            history[symbol] = to_frame(records)
+    return history
@@ -0,0 +1,73 @@
+"""
+Process-wide live quote cache shared by every user's request.
+
+Quotes live in the Django cache keyed by symbol. While NSE is trading they
+expire after QUOTE_CACHE_TTL seconds; once the market closes the last price
+cannot change, so entries are kept until the next session opens. Concurrent
+misses for the same symbol wait on the one in-flight upstream fetch instead
+of issuing their own. Symbols covered by the Kite tick stream are answered
+from the in-process quote book and never reach the cache or yfinance.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from financial_data.utils.market_data import get_live_prices
+from financial_data.utils.market_hours import is_market_open, next_market_open, now_ist
+from financial_data.utils.quote_stream import quote_book
+
+
+_lock = threading.Lock()
+_inflight = {}  # symbol -> threading.Event set when its fetch finishes
+
+
+def _key(symbol):
+    return f"quote_{symbol.upper()}"
+
+
+def quote_ttl(now=None):
+    """Seconds a freshly fetched quote stays valid"""
+    now = now or now_ist()
+    if is_market_open(now):
+        return settings.QUOTE_CACHE_TTL
+    return max(int((next_market_open(now) - now).total_seconds()), settings.QUOTE_CACHE_TTL)
+
+
+def _read(symbols):
+    cached = cache.get_many([_key(symbol) for symbol in symbols])
+    return {symbol: cached[_key(symbol)] for symbol in symbols if _key(symbol) in cached}
+
+
+def get_quotes(symbols):
+    """Return {symbol: last price}, fetching only symbols nobody has fetched this TTL window."""
+    symbols = list(dict.fromkeys(symbols))
+    quotes = quote_book.last_prices(symbols)
+    quotes.update(_read([symbol for symbol in symbols if symbol not in quotes]))
+    misses = [symbol for symbol in symbols if symbol not in quotes]
+    if not misses:
+        return quotes
+
+    to_fetch, to_wait = [], []
+    with _lock:
+        for symbol in misses:
+            if symbol in _inflight:
+                to_wait.append(_inflight[symbol])
+            else:
+                _inflight[symbol] = threading.Event()
+                to_fetch.append(symbol)
+
+    if to_fetch:
+        try:
+            prices = get_live_prices(to_fetch)
+            cache.set_many({_key(symbol): float(price) for symbol, price in prices.items()}, timeout=quote_ttl())
+            quotes.update({symbol: float(price) for symbol, price in prices.items()})
+        finally:
+            with _lock:
+                for symbol in to_fetch:
+                    _inflight.pop(symbol).set()
+
+    for event in to_wait:
+        event.wait(timeout=settings.QUOTE_FETCH_WAIT)
+    quotes.update(_read([symbol for symbol in misses if symbol not in quotes]))
+    return quotes
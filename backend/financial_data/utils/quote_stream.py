@@ -0,0 +1,195 @@
+"""
+Streaming live quotes from Kite's websocket ticker into an in-process quote book.
+
+The ingestion service subscribes (in quote mode) to the union of instruments
+held by every linked user it has seen, and writes each tick into `quote_book`.
+Endpoints read last-traded prices from the book with a dict lookup and only
+fall back to polling for symbols the stream does not cover.
+
+Set KITE_TICKER_ROOT to a local replay server (`manage.py replay_ticks`) to
+run the whole pipeline offline against recorded ticks.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from kiteconnect import KiteTicker
+
+from config import KITE_API_KEY
+from financial_data.utils.market_hours import is_market_open
+from financial_data.utils.symbols import to_yfinance_symbol
+
+
+Quote = namedtuple("Quote", ["instrument_token", "last_price", "close", "change", "volume", "received_at"])
+
+
+class QuoteBook:
+    """
+    Latest quote per instrument token.
+
+    The ticker thread is the only writer and replaces whole immutable Quote
+    tuples; readers do plain dict lookups. Neither side takes a lock, and a
+    reader sees either the previous or the new quote, never a mix of both.
+    """
+
+    def __init__(self):
+        self._quotes = {}
+        self._tokens_by_symbol = {}
+        # Bumped on every batch of ticks so consumers can cheaply detect changes
+        self.version = 0
+
+    def register(self, symbol, instrument_token):
+        self._tokens_by_symbol[symbol] = instrument_token
+
+    def update(self, ticks):
+        received_at = time.time()
+        for tick in ticks:
+            ohlc = tick.get("ohlc") or {}
+            self._quotes[tick["instrument_token"]] = Quote(
+                instrument_token=tick["instrument_token"],
+                last_price=tick["last_price"],
+                close=ohlc.get("close"),
+                change=tick.get("change"),
+                volume=tick.get("volume_traded"),
+                received_at=received_at,
+            )
+        self.version += 1
+
+    def get(self, instrument_token):
+        return self._quotes.get(instrument_token)
+
+    def get_by_symbol(self, symbol):
+        instrument_token = self._tokens_by_symbol.get(symbol)
+        return self._quotes.get(instrument_token) if instrument_token is not None else None
+
+    def last_prices(self, symbols):
+        """
+        {symbol: last price} for symbols the book has a usable quote for.
+
+        While the market is open a quote older than QUOTE_BOOK_MAX_AGE seconds
+        means the stream stalled, so it is skipped; after the close the last
+        tick stays valid.
+        """
+        max_age = settings.QUOTE_BOOK_MAX_AGE if is_market_open() else None
+        now = time.time()
+        prices = {}
+        for symbol in symbols:
+            quote = self.get_by_symbol(symbol)
+            if quote is None or (max_age is not None and now - quote.received_at > max_age):
+                continue
+            prices[symbol] = quote.last_price
+        return prices
+
+    def instrument_tokens(self):
+        return set(self._tokens_by_symbol.values())
+
+
+class TickIngestionService:
+    """Owns the KiteTicker connection and keeps its subscriptions in sync with the book"""
+
+    def __init__(self, book):
+        self.book = book
+        self._ticker = None
+        self._tokens = set()
+        self._lock = threading.Lock()
+
+    def is_running(self):
+        return self._ticker is not None
+
+    def ensure_running(self, access_token):
+        """Connect with `access_token` unless a connection (or reconnect loop) is already up"""
+        with self._lock:
+            if self._ticker is not None:
+                return
+            ticker = KiteTicker(
+                KITE_API_KEY,
+                access_token,
+                root=settings.KITE_TICKER_ROOT,
+                reconnect_max_tries=settings.KITE_TICKER_RECONNECT_TRIES,
+            )
+            ticker.on_connect = self._on_connect
+            ticker.on_ticks = self._on_ticks
+            ticker.on_noreconnect = self._on_noreconnect
+            self._ticker = ticker
+        print(f"🔍 Backend: Starting Kite ticker stream at {settings.KITE_TICKER_ROOT or KiteTicker.ROOT_URI}")
+        self._connect(ticker)
+
+    def _connect(self, ticker):
+        from twisted.internet import reactor
+
+        if reactor.running:
+            # The reactor cannot be restarted; later connections are scheduled on it
+            reactor.callFromThread(ticker.connect, threaded=True)
+        else:
+            ticker.connect(threaded=True)
+
+    def subscribe(self, instrument_tokens):
+        with self._lock:
+            new_tokens = set(instrument_tokens) - self._tokens
+            self._tokens |= new_tokens
+            ticker = self._ticker
+        if new_tokens and ticker is not None and ticker.is_connected():
+            from twisted.internet import reactor
+
+            reactor.callFromThread(self._subscribe_on, ticker, sorted(new_tokens))
+
+    def _subscribe_on(self, ticker, instrument_tokens):
+        ticker.subscribe(instrument_tokens)
+        ticker.set_mode(ticker.MODE_QUOTE, instrument_tokens)
+
+    def _on_connect(self, ticker, response):
+        with self._lock:
+            tokens = sorted(self._tokens)
+        if tokens:
+            self._subscribe_on(ticker, tokens)
+
+    def _on_ticks(self, ticker, ticks):
+        self.book.update(ticks)
+
+    def _on_noreconnect(self, ticker):
+        # Usually an expired token; the next linked user's request reconnects with a fresh one
+        print("⚠️ Backend: Kite ticker gave up reconnecting")
+        with self._lock:
+            if self._ticker is ticker:
+                self._ticker = None
+
+
+quote_book = QuoteBook()
+ingestion_service = TickIngestionService(quote_book)
+_seeded = threading.Event()
+
+
+def _seed_from_linked_users():
+    """Subscribe to every linked user's holdings, not just those who made requests"""
+    from financial_data.models import ZerodhaUser
+    from financial_data.utils.holdings_cache import get_holdings
+    from financial_data.utils.zerodha_session import is_token_expired
+
+    try:
+        for zerodha_user in ZerodhaUser.objects.all():
+            # Expired sessions would only fail against Kite
+            if is_token_expired(zerodha_user):
+                continue
+            try:
+                get_holdings(zerodha_user)
+            except Exception as e:
+                print(f"⚠️ Backend: Could not load holdings of {zerodha_user} for the ticker: {e}")
+    finally:
+        close_old_connections()
+
+
+def track_holdings(access_token, holdings):
+    """Register holdings' instruments in the quote book and make sure the stream covers them"""
+    if not settings.KITE_TICKER_ENABLED:
+        return
+    for holding in holdings:
+        if holding.get("instrument_token"):
+            quote_book.register(to_yfinance_symbol(holding["tradingsymbol"], holding.get("exchange")), holding["instrument_token"])
+    ingestion_service.ensure_running(access_token)
+    ingestion_service.subscribe(quote_book.instrument_tokens())
+
+    if not _seeded.is_set():
+        _seeded.set()
+        threading.Thread(target=_seed_from_linked_users, name="kite-ticker-seed", daemon=True).start()
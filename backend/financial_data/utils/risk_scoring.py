@@ -0,0 +1,224 @@
+"""
+Portfolio risk scoring.
+
+Pure functions of holding values, so they can run in worker processes
+(`manage.py recalculate_risk`) without Django being set up there.
+"""
+import numpy as np
+
+from financial_data.stocks_list import stocks
+
+
+# Rank boundaries (0-based, by market cap) of the SEBI cap buckets
+LARGE_CAP_RANKS = 100
+MID_CAP_RANKS = 250
+
+
+def cap_bucket(rank):
+    if rank < LARGE_CAP_RANKS:
+        return "Large Cap"
+    elif rank < MID_CAP_RANKS:
+        return "Mid Cap"
+    return "Small Cap"
+
+
+def build_cap_index(ranked_symbols):
+    """{symbol: cap bucket} for symbols ordered by market cap, largest first"""
+    index = {}
+    ranked_symbols = [s.upper() for s in ranked_symbols if str(s).lower() != 'nan']
+    for rank, symbol in enumerate(ranked_symbols):
+        index.setdefault(symbol, cap_bucket(rank))
+    return index
+
+
+# The hand-maintained ranking in stocks_list; used until (or unless) a
+# ranking by actual market caps is installed
+_cap_index = build_cap_index(stocks)
+
+
+def install_cap_index(index):
+    """Make `index` the default for this process (also used as a process-pool initializer)"""
+    global _cap_index
+    _cap_index = index
+
+
+# --- Risk Calculation Functions ---
+def get_cap_category(stock_name, cap_index=None):
+    return (_cap_index if cap_index is None else cap_index).get(stock_name.upper())
+
+cap_scores = {"Large Cap": 1, "Mid Cap": 2, "Small Cap": 3}
+
+def calc_market_cap_score(holdings=None, total_stock_value=None, mode="symbol", cap_index=None):
+    """
+    holdings: dict {stock_symbol: holding_value}
+    total_stock_value: float
+    mode: "symbol" or "total"
+    cap_index: {symbol: cap bucket}; defaults to the process-wide index
+    """
+    if mode == "total":
+        # If only total value is provided, assume mid-risk stock allocation (Mid Cap)
+        return 2.0  # default risk score for unknown allocation
+    elif mode == "symbol" and holdings:
+        total_stock_value = sum(holdings.values())
+        if total_stock_value == 0:
+            return 0  # no stocks
+        weights = {"Large Cap": 0, "Mid Cap": 0, "Small Cap": 0}
+        for stock, value in holdings.items():
+            cap = get_cap_category(stock, cap_index)
+            if cap:
+                weights[cap] += value
+        for cap in weights:
+            weights[cap] = weights[cap] / total_stock_value if total_stock_value > 0 else 0
+        risk_score = sum(weights[cap] * cap_scores[cap] for cap in weights)
+        return risk_score
+    return 0
+
+def calc_fd_score(fd_value, stock_value):
+    total = fd_value + stock_value
+    if total == 0:
+        return 0
+    
+    safety_ratio = fd_value / total
+    if safety_ratio > 0.75:
+        return 1.0
+    elif 0.50 <= safety_ratio <= 0.75:
+        return 1.5
+    elif 0.25 <= safety_ratio < 0.50:
+        return 2.0
+    else:
+        return 3.0
+
+def risk_tolerance_bucket(score):
+    score = round(score, 2)
+    if 1.00 <= score <= 1.50:
+        return "Conservative (Low Risk)"
+    elif 1.51 <= score <= 2.50:
+        return "Moderate"
+    elif 2.51 <= score <= 3.00:
+        return "Aggressive (High Risk)"
+    return "Unknown"
+
+def calc_mf_score(mf_value, stock_value, fd_value):
+    total = mf_value + stock_value + fd_value
+    if total == 0:
+        return 0
+    
+    mf_score = 1.8
+    weight = mf_value / total
+    return mf_score * weight
+
+def calc_final_risk(fd_value, holdings=None, mf_value=0, mode="symbol", total_stock_value=None, cap_index=None):
+    """
+    mode: "symbol" or "total"
+    holdings: dict of {symbol: value} (used if mode="symbol")
+    total_stock_value: float (used if mode="total")
+    cap_index: {symbol: cap bucket}; defaults to the process-wide index
+    """
+    if mode == "total":
+        stock_value = total_stock_value or 0
+    else:
+        stock_value = sum(holdings.values()) if holdings else 0
+
+    total_assets = fd_value + stock_value + mf_value
+    if total_assets == 0:
+        return 0, "No Investments"
+
+    risk_a = calc_market_cap_score(holdings, total_stock_value, mode, cap_index)
+    risk_b = calc_fd_score(fd_value, stock_value)
+    risk_c = calc_mf_score(mf_value, stock_value, fd_value)
+
+    weights = {
+        "stocks": stock_value / total_assets if total_assets > 0 else 0,
+        "fd": fd_value / total_assets if total_assets > 0 else 0,
+        "mf": mf_value / total_assets if total_assets > 0 else 0,
+    }
+
+    final_score = (
+        risk_a * weights["stocks"] +
+        risk_b * weights["fd"] +
+        risk_c  # already weighted
+    )
+
+    return final_score, risk_tolerance_bucket(final_score)
+
+
+RISK_BUCKETS = np.array(["Conservative (Low Risk)", "Moderate", "Aggressive (High Risk)", "Unknown", "No Investments"])
+
+
+def score_portfolios(fd_values, stock_values, mf_values, holdings=None, cap_index=None):
+    """
+    Vectorized calc_final_risk over many portfolios at once.
+
+    fd_values, stock_values, mf_values: equal-length sequences of amounts
+    holdings: optional sequence (same length) of {symbol: value} dicts or None;
+        a portfolio with a dict is scored in "symbol" mode (its stock value is
+        the sum of the dict), otherwise in "total" mode from stock_values
+    cap_index: {symbol: cap bucket}; defaults to the process-wide index
+
+    Returns (scores float array, categories list) in input order, with the
+    same values calc_final_risk gives for each portfolio.
+    """
+    fd = np.asarray(fd_values, dtype="f8")
+    stock = np.asarray(stock_values, dtype="f8").copy()
+    mf = np.asarray(mf_values, dtype="f8")
+    size = len(fd)
+    cap_index = _cap_index if cap_index is None else cap_index
+
+    # Market-cap score: "total" mode assumes Mid Cap; "symbol" mode weights each holding's cap score
+    risk_a = np.full(size, 2.0)
+    if holdings is not None:
+        symbol_mode = np.array([h is not None for h in holdings], dtype=bool)
+        owners, values, scores = [], [], []
+        for i, portfolio in enumerate(holdings):
+            for symbol, value in (portfolio or {}).items():
+                owners.append(i)
+                values.append(value)
+                scores.append(cap_scores.get(cap_index.get(symbol.upper()), 0))
+        owners = np.asarray(owners, dtype="i8")
+        values = np.asarray(values, dtype="f8")
+        symbol_totals = np.bincount(owners, weights=values, minlength=size)
+        weighted = np.bincount(owners, weights=values * np.asarray(scores, dtype="f8"), minlength=size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            symbol_risk = np.where(symbol_totals > 0, weighted / symbol_totals, 0.0)
+        risk_a = np.where(symbol_mode, symbol_risk, risk_a)
+        stock = np.where(symbol_mode, symbol_totals, stock)
+
+    total_assets = fd + stock + mf
+    with np.errstate(divide="ignore", invalid="ignore"):
+        safe_total = np.where(total_assets > 0, total_assets, 1.0)
+        fd_stock = fd + stock
+        safety_ratio = np.where(fd_stock > 0, fd / np.where(fd_stock > 0, fd_stock, 1.0), 0.0)
+
+    risk_b = np.select(
+        [fd_stock == 0, safety_ratio > 0.75, safety_ratio >= 0.50, safety_ratio >= 0.25],
+        [0.0, 1.0, 1.5, 2.0],
+        default=3.0,
+    )
+    risk_c = 1.8 * mf / safe_total
+    scores = np.where(
+        total_assets == 0,
+        0.0,
+        risk_a * stock / safe_total + risk_b * fd / safe_total + risk_c,
+    )
+
+    rounded = np.round(scores, 2)
+    # np.round scales by 100 in floating point and can break .xx5 ties differently
+    # from round() in risk_tolerance_bucket; those few are rounded the scalar way
+    for i in np.flatnonzero(np.abs(scores * 100 % 1 - 0.5) < 1e-6):
+        rounded[i] = round(float(scores[i]), 2)
+    bucket = np.select(
+        [
+            total_assets == 0,
+            (rounded >= 1.00) & (rounded <= 1.50),
+            (rounded >= 1.51) & (rounded <= 2.50),
+            (rounded >= 2.51) & (rounded <= 3.00),
+        ],
+        [4, 0, 1, 2],
+        default=3,
+    )
+    return scores, RISK_BUCKETS[bucket].tolist()
+
+
+def score_profile(inputs):
+    """calc_final_risk over a dict of its keyword arguments (a picklable unit of work for process pools)"""
+    return calc_final_risk(**inputs)
@@ -0,0 +1,11 @@
+from financial_data.utils.instruments import instrument_index, yfinance_symbol_for
+
+
+def to_yfinance_symbol(tradingsymbol, exchange=None):
+    """Map a Zerodha trading symbol (and its exchange, when known) to its yfinance ticker"""
+    # The NSE listing wins even for shares held on BSE; only BSE-only scrips map to .BO
+    instrument = instrument_index.lookup(tradingsymbol)
+    if instrument:
+        return instrument.yfinance_symbol
+    # Not in the instrument master (e.g. not loaded yet): apply the loader's rule directly
+    return yfinance_symbol_for(tradingsymbol, (exchange or "NSE").upper())
@@ -0,0 +1,111 @@
+"""
+Local stand-in for Kite's websocket ticker that replays recorded ticks.
+
+Recordings are JSON lines, one tick per line:
+
+    {"instrument_token": 2953217, "last_price": 4123.5, "volume_traded": 1200,
+     "ohlc": {"open": 4100.0, "high": 4130.0, "low": 4095.0, "close": 4098.2}}
+
+Ticks are encoded in Kite's binary quote-mode packet format, so KiteTicker
+parses them exactly as it would parse live data. Only instruments a client
+has subscribed to are sent.
+"""
+import json
+import struct
+
+from autobahn.twisted.websocket import WebSocketServerFactory, WebSocketServerProtocol
+
+
+PRICE_DIVISOR = 100
+
+
+def load_ticks(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _price(value):
+    return int(round(value * PRICE_DIVISOR))
+
+
+def pack_quote(tick):
+    """One tick as a 44-byte quote-mode packet"""
+    ohlc = tick.get("ohlc", {})
+    return struct.pack(
+        ">11i",
+        tick["instrument_token"],
+        _price(tick["last_price"]),
+        tick.get("last_traded_quantity", 0),
+        _price(tick.get("average_traded_price", tick["last_price"])),
+        tick.get("volume_traded", 0),
+        tick.get("total_buy_quantity", 0),
+        tick.get("total_sell_quantity", 0),
+        _price(ohlc.get("open", 0)),
+        _price(ohlc.get("high", 0)),
+        _price(ohlc.get("low", 0)),
+        _price(ohlc.get("close", 0)),
+    )
+
+
+def pack_message(ticks):
+    """A binary frame: packet count, then (length, packet) for each tick"""
+    packets = [pack_quote(tick) for tick in ticks]
+    return struct.pack(">H", len(packets)) + b"".join(struct.pack(">H", len(p)) + p for p in packets)
+
+
+def group_frames(ticks):
+    """Split a recording into frames holding at most one tick per instrument, like the live feed"""
+    frames, current, seen = [], [], set()
+    for tick in ticks:
+        if tick["instrument_token"] in seen:
+            frames.append(current)
+            current, seen = [], set()
+        current.append(tick)
+        seen.add(tick["instrument_token"])
+    if current:
+        frames.append(current)
+    return frames
+
+
+class ReplayProtocol(WebSocketServerProtocol):
+    def onOpen(self):
+        self.subscribed = set()
+        self.position = 0
+        self.sender = None
+
+    def onMessage(self, payload, isBinary):
+        if isBinary:
+            return
+        message = json.loads(payload.decode("utf-8"))
+        if message.get("a") == "subscribe":
+            self.subscribed.update(message["v"])
+            if self.sender is None:
+                self.sender = self.factory.clock.callLater(0, self.send_next)
+        elif message.get("a") == "unsubscribe":
+            self.subscribed.difference_update(message["v"])
+
+    def send_next(self):
+        frames = self.factory.frames
+        if not frames or (self.position >= len(frames) and not self.factory.loop):
+            return
+        batch = [tick for tick in frames[self.position % len(frames)] if tick["instrument_token"] in self.subscribed]
+        self.position += 1
+        if batch:
+            self.sendMessage(pack_message(batch), isBinary=True)
+        self.sender = self.factory.clock.callLater(self.factory.interval, self.send_next)
+
+    def onClose(self, wasClean, code, reason):
+        if getattr(self, "sender", None) is not None and self.sender.active():
+            self.sender.cancel()
+
+
+def replay_factory(url, ticks, interval=1.0, loop=True):
+    from twisted.internet import reactor
+
+    factory = WebSocketServerFactory(url)
+    factory.protocol = ReplayProtocol
+    factory.frames = group_frames(ticks)
+    factory.interval = interval
+    factory.loop = loop
+    factory.clock = reactor
+    return factory
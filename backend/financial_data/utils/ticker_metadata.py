@@ -0,0 +1,132 @@
+"""
+Long-lived cache for yfinance `.info`, the slowest call we make per holding.
+
+Fields are grouped by how quickly they go stale: static fields (name, sector)
+are trusted for TICKER_STATIC_TTL seconds, daily fields (previous close,
+market cap, day and 52-week ranges) for one NSE session. A stale entry is
+still served immediately and handed to a background refresher thread, so a
+request only ever blocks on `.info` for symbols it has never seen, fetched
+concurrently.
+"""
+import queue
+import threading
+import time
+
+import yfinance as yf
+from django.conf import settings
+from django.core.cache import cache
+
+from financial_data.utils.fetch_executor import fan_out
+from financial_data.utils.market_hours import session_date
+
+
+STATIC_FIELDS = ("longName", "shortName", "sector", "industry")
+DAILY_FIELDS = (
+    "currentPrice",
+    "previousClose",
+    "marketCap",
+    "dayHigh",
+    "dayLow",
+    "fiftyTwoWeekHigh",
+    "fiftyTwoWeekLow",
+)
+
+_refresh_queue = queue.Queue()
+_queued = set()
+_known = set()
+_lock = threading.Lock()
+_refresher = None
+
+
+def _key(symbol):
+    return f"ticker_info_{symbol.upper()}"
+
+
+def _is_stale(entry):
+    static_age = time.time() - entry["static_fetched_at"]
+    return static_age > settings.TICKER_STATIC_TTL or entry["session"] != session_date().isoformat()
+
+
+def _fetch(symbol):
+    """Call yfinance `.info` and store the fields we use; returns the new entry or None."""
+    try:
+        info = yf.Ticker(symbol).info
+    except Exception as e:
+        print(f"⚠️ yfinance info error for {symbol}: {e}")
+        return None
+    entry = {
+        "static": {field: info[field] for field in STATIC_FIELDS if info.get(field) is not None},
+        "static_fetched_at": time.time(),
+        "daily": {field: info[field] for field in DAILY_FIELDS if info.get(field) is not None},
+        "session": session_date().isoformat(),
+    }
+    cache.set(_key(symbol), entry, timeout=settings.TICKER_METADATA_CACHE_TIMEOUT)
+    with _lock:
+        _known.add(symbol)
+    return entry
+
+
+def _refresh_loop():
+    while True:
+        try:
+            symbol = _refresh_queue.get(timeout=settings.TICKER_METADATA_REFRESH_INTERVAL)
+        except queue.Empty:
+            # Idle: proactively re-queue known symbols whose entries went stale
+            with _lock:
+                known = list(_known)
+            for symbol in known:
+                entry = cache.get(_key(symbol))
+                if entry is None or _is_stale(entry):
+                    _schedule_refresh(symbol)
+            continue
+        with _lock:
+            _queued.discard(symbol)
+        _fetch(symbol)
+
+
+def _ensure_refresher():
+    global _refresher
+    with _lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="ticker-metadata-refresher", daemon=True)
+            _refresher.start()
+
+
+def _schedule_refresh(symbol):
+    with _lock:
+        if symbol in _queued:
+            return
+        _queued.add(symbol)
+    _refresh_queue.put(symbol)
+
+
+def _flatten(entry):
+    return {**entry["static"], **entry["daily"]}
+
+
+def get_ticker_metadata(symbols, deadline=None):
+    """
+    Return {symbol: info-like dict} with the cached static and daily fields.
+
+    Unseen symbols are fetched concurrently (within `deadline` seconds, the
+    request deadline by default); stale entries are returned as-is and
+    refreshed in the background. Symbols whose fetch fails or times out are
+    left out, so callers can report them.
+    """
+    _ensure_refresher()
+    entries = {}
+    unseen = []
+    for symbol in dict.fromkeys(symbols):
+        entry = cache.get(_key(symbol))
+        if entry is None:
+            unseen.append(symbol)
+            continue
+        with _lock:
+            _known.add(symbol)
+        if _is_stale(entry):
+            _schedule_refresh(symbol)
+        entries[symbol] = entry
+    if unseen:
+        fetched, _ = fan_out(_fetch, unseen, deadline=deadline)
+        entries.update((symbol, entry) for symbol, entry in fetched.items() if entry)
+    return {symbol: _flatten(entries[symbol]) for symbol in dict.fromkeys(symbols) if symbol in entries}
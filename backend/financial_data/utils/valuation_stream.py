@@ -0,0 +1,108 @@
+"""
+Server-sent event stream of a user's portfolio valuation.
+
+The positions (quantity, average price, previous close) are resolved once
+when the connection opens. After the initial `snapshot` event the stream
+only re-reads quotes, which get_quotes serves from the Kite tick book or the
+shared quote cache, and sends a `delta` event carrying just the holdings
+whose price changed, plus fresh portfolio totals.
+
+Under ASGI (`wealthwise/asgi.py`) the async generator is used and an idle
+connection costs no thread; under WSGI the sync generator holds a worker
+thread for the life of the connection.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from financial_data.utils.quote_cache import get_quotes
+
+
+HEARTBEAT = ": keep-alive\n\n"
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+class PortfolioValuation:
+    def __init__(self, positions):
+        # {symbol: {"quantity", "average_price", "previous_close"}}
+        self.positions = positions
+        self.symbols = list(positions)
+        self._sent = {}  # symbol -> last price sent to the client
+
+    def _row(self, symbol, price):
+        position = self.positions[symbol]
+        quantity = position["quantity"]
+        previous_close = position["previous_close"]
+        day_change = (price - previous_close) * quantity if previous_close else None
+        return {
+            "symbol": symbol,
+            "currentPrice": price,
+            "currentValue": quantity * price,
+            "dayChange": day_change,
+            "dayChangePercent": (price / previous_close - 1) * 100 if previous_close else None,
+        }
+
+    def _summary(self):
+        total_current_value = 0
+        total_day_change = 0
+        for symbol, price in self._sent.items():
+            row = self._row(symbol, price)
+            total_current_value += row["currentValue"]
+            total_day_change += row["dayChange"] or 0
+        return {
+            "total_invested_amount": sum(p["quantity"] * p["average_price"] for p in self.positions.values()),
+            "total_current_value": total_current_value,
+            "total_day_change": total_day_change,
+        }
+
+    def snapshot(self, prices):
+        self._sent = {symbol: prices[symbol] for symbol in self.symbols if symbol in prices}
+        return _event("snapshot", {
+            "stocks": [self._row(symbol, price) for symbol, price in self._sent.items()],
+            "portfolio_summary": self._summary(),
+        })
+
+    def delta(self, prices):
+        """A `delta` event for holdings whose price moved since the last event, or None"""
+        changed = {symbol: price for symbol, price in prices.items()
+                   if symbol in self.positions and self._sent.get(symbol) != price}
+        if not changed:
+            return None
+        self._sent.update(changed)
+        return _event("delta", {
+            "stocks": [self._row(symbol, price) for symbol, price in changed.items()],
+            "portfolio_summary": self._summary(),
+        })
+
+
+def stream_events(valuation, prices):
+    """Sync generator of SSE messages, starting from the prices used for the snapshot"""
+    yield valuation.snapshot(prices)
+    last_sent = time.monotonic()
+    while True:
+        time.sleep(settings.VALUATION_STREAM_INTERVAL)
+        message = valuation.delta(get_quotes(valuation.symbols))
+        if message is None and time.monotonic() - last_sent < settings.VALUATION_STREAM_HEARTBEAT:
+            continue
+        yield message or HEARTBEAT
+        last_sent = time.monotonic()
+
+
+async def astream_events(valuation, prices):
+    """Async counterpart of stream_events for ASGI servers"""
+    fetch_quotes = sync_to_async(get_quotes, thread_sensitive=False)
+    yield valuation.snapshot(prices)
+    last_sent = time.monotonic()
+    while True:
+        await asyncio.sleep(settings.VALUATION_STREAM_INTERVAL)
+        message = valuation.delta(await fetch_quotes(valuation.symbols))
+        if message is None and time.monotonic() - last_sent < settings.VALUATION_STREAM_HEARTBEAT:
+            continue
+        yield message or HEARTBEAT
+        last_sent = time.monotonic()
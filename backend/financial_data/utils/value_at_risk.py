@@ -0,0 +1,169 @@
+"""
+Value-at-Risk and Expected Shortfall of a portfolio of holdings.
+
+Returns come from the local price store as one symbols x dates matrix over a
+lookback window ending at the as-of date. The window starts on the first day
+every symbol has a return, so a recently listed holding shortens it instead of
+padding it with flat days; a later day a symbol did not trade counts as no
+move (its move lands on its next bar). A symbol with no return in the window
+at all is left out and reported missing. Historical figures are quantiles of the portfolio's P&L replayed
+over every day in the window (10-day figures use overlapping 10-trading-day
+windows). Parametric figures assume normally distributed P&L with the same
+mean and standard deviation.
+
+The scenario matrices are memoized by (symbol set, lookback, as-of date), so
+a portfolio whose prices or quantities changed only needs a matrix-vector
+product. Results are memoized by a hash of the positions and the as-of date.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from financial_data.utils import price_store
+from financial_data.utils.analytics import align_closes, daily_returns
+
+
+HORIZONS = (1, 10)  # trading days
+
+_scenario_memo = OrderedDict()  # (frozenset(symbols), lookback, as_of) -> (symbols, dates, {horizon: returns})
+_result_memo = OrderedDict()  # (positions hash, lookback, as_of, confidence levels) -> result
+_memo_lock = threading.Lock()
+
+
+def _remember(memo, key, value):
+    with _memo_lock:
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > settings.VALUE_AT_RISK_MEMO_SIZE:
+            memo.popitem(last=False)
+
+
+def _recall(memo, key):
+    with _memo_lock:
+        return memo.get(key)
+
+
+def positions_hash(positions):
+    """Stable digest of {symbol: value}"""
+    payload = json.dumps(sorted((symbol, round(float(value), 2)) for symbol, value in positions.items()))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def horizon_returns(returns, horizon):
+    """Compounded returns over every run of `horizon` consecutive columns (NaN-free input)"""
+    if horizon == 1:
+        return returns
+    growth = np.cumsum(np.log1p(returns), axis=1)
+    growth = np.concatenate([np.zeros((returns.shape[0], 1)), growth], axis=1)
+    return np.expm1(growth[:, horizon:] - growth[:, :-horizon])
+
+
+def scenario_returns(symbols, lookback, as_of):
+    """
+    (symbols with returns in the window, dates of the daily scenarios,
+    {horizon: symbols x scenarios returns}) over (as_of - lookback days,
+    as_of], from the first date every one of those symbols has a return.
+    """
+    symbols = sorted(set(symbols))
+    key = (frozenset(symbols), lookback, as_of)
+    cached = _recall(_scenario_memo, key)
+    if cached is not None:
+        return cached
+
+    history = price_store.get_history(symbols)
+    ordered = [symbol for symbol in symbols if symbol in history]
+    _, dates, closes = align_closes({symbol: history[symbol] for symbol in ordered})
+    returns = daily_returns(closes)
+    start = pd.Timestamp(as_of - timedelta(days=lookback))
+    in_window = (dates > start) & (dates <= pd.Timestamp(as_of))
+    dates, returns = dates[in_window], returns[:, in_window]
+
+    # A symbol with no return in the window (delisted, or history ending before
+    # it) has nothing to replay and is reported missing instead of emptying the window
+    has_return = ~np.isnan(returns)
+    traded = has_return.any(axis=1)
+    ordered = [symbol for symbol, keep in zip(ordered, traded) if keep]
+    returns, has_return = returns[traded], has_return[traded]
+
+    # Days before a symbol's first return (not listed yet) are not flat days for it
+    start_column = int(np.argmax(has_return, axis=1).max()) if returns.size else 0
+    dates, returns = dates[start_column:], np.nan_to_num(returns[:, start_column:], nan=0.0)
+
+    cached = (ordered, dates, {horizon: horizon_returns(returns, horizon) for horizon in HORIZONS})
+    _remember(_scenario_memo, key, cached)
+    return cached
+
+
+def _historical(pnl, confidence):
+    losses = -pnl
+    var = float(np.quantile(losses, confidence))
+    return var, float(losses[losses >= var].mean())
+
+
+def _parametric(pnl, confidence):
+    mean, std = float(pnl.mean()), float(pnl.std(ddof=1))
+    z = NormalDist().inv_cdf(confidence)
+    var = -mean + z * std
+    expected_shortfall = -mean + std * NormalDist().pdf(z) / (1 - confidence)
+    return var, expected_shortfall
+
+
+def value_at_risk(positions, as_of, lookback=None, confidence_levels=None):
+    """
+    VaR and Expected Shortfall of {yfinance symbol: position value}.
+
+    Returns a dict with the symbols used, those without price history in the
+    lookback window, the number of daily scenarios, the dates they span with
+    the effective lookback in days (shorter than `lookback` when a symbol listed later) and one row
+    per (confidence, horizon, method), with losses in currency and as a
+    percentage of the priced value. `risk` is empty when there are fewer than VALUE_AT_RISK_MIN_OBSERVATIONS scenarios.
+    """
+    lookback = lookback or settings.VALUE_AT_RISK_LOOKBACK_DAYS
+    confidence_levels = confidence_levels or settings.VALUE_AT_RISK_CONFIDENCE_LEVELS
+    key = (positions_hash(positions), lookback, as_of, tuple(confidence_levels))
+    cached = _recall(_result_memo, key)
+    if cached is not None:
+        return cached
+
+    symbols, dates, scenarios = scenario_returns(positions, lookback, as_of)
+    values = np.array([positions[symbol] for symbol in symbols], dtype="f8")
+    portfolio_value = float(values.sum())
+    observations = scenarios[1].shape[1]
+
+    risk = []
+    if observations >= settings.VALUE_AT_RISK_MIN_OBSERVATIONS and portfolio_value > 0:
+        for horizon in HORIZONS:
+            pnl = values @ scenarios[horizon]
+            for confidence in confidence_levels:
+                for method, estimate in (("historical", _historical), ("parametric", _parametric)):
+                    var, expected_shortfall = estimate(pnl, confidence)
+                    risk.append({
+                        "confidence": confidence,
+                        "horizon_days": horizon,
+                        "method": method,
+                        "value_at_risk": round(var, 2),
+                        "expected_shortfall": round(expected_shortfall, 2),
+                        "value_at_risk_percent": round(var / portfolio_value * 100, 4),
+                        "expected_shortfall_percent": round(expected_shortfall / portfolio_value * 100, 4),
+                    })
+
+    result = {
+        "symbols": symbols,
+        "missing_symbols": sorted(symbol for symbol in positions if symbol not in symbols),
+        "portfolio_value": round(portfolio_value, 2),
+        "observations": observations,
+        "window_start": dates[0].date().isoformat() if len(dates) else None,
+        "window_end": dates[-1].date().isoformat() if len(dates) else None,
+        # Calendar days from the first scenario to as_of, inclusive; at most `lookback`
+        "effective_lookback": (as_of - dates[0].date()).days + 1 if len(dates) else 0,
+        "risk": risk,
+    }
+    _remember(_result_memo, key, result)
+    return result
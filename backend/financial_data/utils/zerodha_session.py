@@ -0,0 +1,51 @@
+"""
+Per-user Zerodha session lookup shared by every financial endpoint.
+
+The ZerodhaUser row (or the fact that there is none) is cached per user for
+ZERODHA_SESSION_CACHE_TTL seconds, so a page firing several endpoints costs
+one query. kite_callback, disconnect_zerodha and token errors invalidate the
+entry; the expiry check is re-applied to the cached row on every lookup.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from financial_data.models import ZerodhaUser
+
+
+NOT_LINKED = "not_linked"
+_MISSING = object()
+
+
+def _key(user_id):
+    return f"zerodha_session_{user_id}"
+
+
+def is_token_expired(zerodha_user):
+    """Check if access token is expired based on update time"""
+    if not zerodha_user.updated_at:
+        return True
+    
+    # Zerodha tokens expire after market hours (around 3:30 PM IST)
+    # We'll consider tokens older than 18 hours as expired
+    token_age = timezone.now() - zerodha_user.updated_at
+    return token_age > timedelta(hours=18)
+
+
+def get_zerodha_user(user):
+    """The user's ZerodhaUser (expired or not), or None if no account is linked"""
+    key = _key(user.id)
+    cached = cache.get(key, _MISSING)
+    if cached is _MISSING:
+        try:
+            cached = ZerodhaUser.objects.select_related('user').get(user=user)
+        except ZerodhaUser.DoesNotExist:
+            cached = NOT_LINKED
+        cache.set(key, cached, timeout=settings.ZERODHA_SESSION_CACHE_TTL)
+    return None if cached == NOT_LINKED else cached
+
+
+def invalidate_zerodha_session(user_id):
+    cache.delete(_key(user_id))
@@ -1,19 +1,41 @@
 import os
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from kiteconnect import KiteConnect
 from .models import ZerodhaUser
 from .models import RiskProfile
-from .stocks_list import stocks
+from .renderers import CompactChartRenderer, EventStreamRenderer
+from financial_data.utils import price_store
+from financial_data.utils.cap_classification import get_cap_index
+from financial_data.utils.charts import PERIODS, build_chart_data, load_chart_inputs, period_cutoff
+from financial_data.utils.covariance import covariance_matrices, matrix_to_list
+from financial_data.utils.downsampling import MIN_POINTS
+from financial_data.utils.encoding import encode_compact
+from financial_data.utils.fetch_executor import fan_out
+from financial_data.utils.holding_snapshots import portfolio_value_series
+from financial_data.utils.holdings_cache import get_holdings, invalidate_holdings
+from financial_data.utils.kite_clients import discard_kite_client, get_kite_client
+from financial_data.utils.market_hours import session_date
+from financial_data.utils.market_data import batches
+from financial_data.utils.quote_cache import get_quotes
+from financial_data.utils.risk_scoring import calc_final_risk, score_portfolios
+from financial_data.utils.symbols import to_yfinance_symbol
+from financial_data.utils.ticker_metadata import get_ticker_metadata
+from financial_data.utils.value_at_risk import value_at_risk
+from financial_data.utils.zerodha_session import invalidate_zerodha_session, is_token_expired
+from financial_data.utils.valuation_stream import PortfolioValuation, astream_events, stream_events
 from django.utils import timezone
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import yfinance as yf
 import json
 
@@ -22,23 +44,17 @@ from config import KITE_API_KEY, KITE_API_SECRET
 if not KITE_API_KEY or not KITE_API_SECRET:
     raise Exception("Please set KITE_API_KEY and KITE_API_SECRET in your environment variables.")
 
-# Initialize KiteConnect with redirect URL
+# Token-less client, only used to build the login URL. Calls made on behalf of a
+# user go through get_kite_client(access_token) so users never share a client.
 kite = KiteConnect(api_key=KITE_API_KEY)
 
-def is_token_expired(zerodha_user):
-    """Check if access token is expired based on update time"""
-    if not zerodha_user.updated_at:
-        return True
-    
-    # Zerodha tokens expire after market hours (around 3:30 PM IST)
-    # We'll consider tokens older than 18 hours as expired
-    token_age = timezone.now() - zerodha_user.updated_at
-    return token_age > timedelta(hours=18)
-
 def handle_token_error(zerodha_user, error_message):
     """Handle token expiration by clearing the stored token"""
     if "api_key" in error_message.lower() or "access_token" in error_message.lower() or "token" in error_message.lower():
         print(f"Token expired for user {zerodha_user.user.username}, clearing stored data")
+        discard_kite_client(zerodha_user.access_token)
+        invalidate_holdings(zerodha_user.user_id)
+        invalidate_zerodha_session(zerodha_user.user_id)
         zerodha_user.delete()
         return True
     return False
@@ -81,6 +97,7 @@ def kite_callback(request):
                 })
             else:
                 print(f"Existing token expired for user {existing_user.user_name}, proceeding with re-auth")
+                invalidate_zerodha_session(request.user.id)
                 existing_user.delete()  # Remove expired token
         except ZerodhaUser.DoesNotExist:
             pass  # Continue with linking process
@@ -119,14 +136,14 @@ def kite_callback(request):
         except Exception as e:
             print(f"Cache cleanup error: {e}")
         
-        data = kite.generate_session(request_token, api_secret=KITE_API_SECRET)
+        # generate_session stores the token on the client, so use a throwaway one
+        data = KiteConnect(api_key=KITE_API_KEY).generate_session(request_token, api_secret=KITE_API_SECRET)
         access_token = data["access_token"]
         
         print(f"Generated access_token: {access_token[:10]}...")
         
         # Get user profile
-        kite.set_access_token(access_token)
-        profile = kite.profile()
+        profile = get_kite_client(access_token).profile()
         
         print(f"Retrieved profile for user: {profile.get('user_name', 'Unknown')}")
         
@@ -159,6 +176,9 @@ def kite_callback(request):
             zerodha_user.exchanges = profile.get('exchanges', [])
             zerodha_user.save()
         
+        # A (re-)linked account must not see holdings or a session cached for the previous token
+        invalidate_holdings(request.user.id)
+        invalidate_zerodha_session(request.user.id)
         print(f"Zerodha user {'created' if created else 'updated'} successfully")        
         return Response({
             "message": "Login successful",
@@ -200,32 +220,14 @@ def kite_profile(request):
     """Get Zerodha user profile"""
     print(f"🔍 Backend: kite_profile called for user: {request.user.username}")
     try:
-        # Get access token from stored user data
-        try:
-            zerodha_user = ZerodhaUser.objects.get(user=request.user)
-            print(f"🔍 Backend: Found Zerodha user in database: {zerodha_user.user_name}")
-        except ZerodhaUser.DoesNotExist:
-            print(f"🔍 Backend: No Zerodha user found in database for: {request.user.username}")
-            return Response({
-                "error": "Zerodha account not linked",
-                "code": "ACCOUNT_NOT_LINKED",
-                "action_required": "Please connect your Zerodha account first"
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if token is expired
-        if is_token_expired(zerodha_user):
-            print(f"🔍 Backend: Token expired for user: {request.user.username}")
-            zerodha_user.delete()
-            return Response({
-                "error": "Zerodha session has expired",
-                "code": "SESSION_EXPIRED",
-                "action_required": "Please reconnect your Zerodha account"
-            }, status=status.HTTP_401_UNAUTHORIZED)
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
         
         try:
             print(f"🔍 Backend: Setting access token and fetching profile for user: {request.user.username}")
-            kite.set_access_token(zerodha_user.access_token)
-            profile = kite.profile()
+            profile = get_kite_client(zerodha_user.access_token).profile()
             print(f"🔍 Backend: Successfully fetched profile: {profile}")
             return Response(profile)
         except Exception as e:
@@ -250,6 +252,9 @@ def disconnect_zerodha(request):
     """Disconnect Zerodha account"""
     try:
         zerodha_user = ZerodhaUser.objects.get(user=request.user)
+        discard_kite_client(zerodha_user.access_token)
+        invalidate_holdings(request.user.id)
+        invalidate_zerodha_session(request.user.id)
         zerodha_user.delete()
         return Response({"message": "Zerodha account disconnected successfully"})
     except ZerodhaUser.DoesNotExist:
@@ -257,116 +262,6 @@ def disconnect_zerodha(request):
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-# ---- Risk Calculation ----
-# Remove nan entries and normalize to uppercase
-stocks = [s.upper() for s in stocks if str(s).lower() != 'nan']
-
-# --- Risk Calculation Functions ---
-def get_cap_category(stock_name):
-    stock_name = stock_name.upper()
-    if stock_name in stocks:
-        idx = stocks.index(stock_name)
-        if 0 <= idx <= 99:
-            return "Large Cap"
-        elif 100 <= idx <= 249:
-            return "Mid Cap"
-        else:
-            return "Small Cap"
-    return None
-
-cap_scores = {"Large Cap": 1, "Mid Cap": 2, "Small Cap": 3}
-
-def calc_market_cap_score(holdings=None, total_stock_value=None, mode="symbol"):
-    """
-    holdings: dict {stock_symbol: holding_value}
-    total_stock_value: float
-    mode: "symbol" or "total"
-    """
-    if mode == "total":
-        # If only total value is provided, assume mid-risk stock allocation (Mid Cap)
-        return 2.0  # default risk score for unknown allocation
-    elif mode == "symbol" and holdings:
-        total_stock_value = sum(holdings.values())
-        if total_stock_value == 0:
-            return 0  # no stocks
-        weights = {"Large Cap": 0, "Mid Cap": 0, "Small Cap": 0}
-        for stock, value in holdings.items():
-            cap = get_cap_category(stock)
-            if cap:
-                weights[cap] += value
-        for cap in weights:
-            weights[cap] = weights[cap] / total_stock_value if total_stock_value > 0 else 0
-        risk_score = sum(weights[cap] * cap_scores[cap] for cap in weights)
-        return risk_score
-    return 0
-
-def calc_fd_score(fd_value, stock_value):
-    total = fd_value + stock_value
-    if total == 0:
-        return 0
-    
-    safety_ratio = fd_value / total
-    if safety_ratio > 0.75:
-        return 1.0
-    elif 0.50 <= safety_ratio <= 0.75:
-        return 1.5
-    elif 0.25 <= safety_ratio < 0.50:
-        return 2.0
-    else:
-        return 3.0
-
-def risk_tolerance_bucket(score):
-    score = round(score, 2)
-    if 1.00 <= score <= 1.50:
-        return "Conservative (Low Risk)"
-    elif 1.51 <= score <= 2.50:
-        return "Moderate"
-    elif 2.51 <= score <= 3.00:
-        return "Aggressive (High Risk)"
-    return "Unknown"
-
-def calc_mf_score(mf_value, stock_value, fd_value):
-    total = mf_value + stock_value + fd_value
-    if total == 0:
-        return 0
-    
-    mf_score = 1.8
-    weight = mf_value / total
-    return mf_score * weight
-
-def calc_final_risk(fd_value, holdings=None, mf_value=0, mode="symbol", total_stock_value=None):
-    """
-    mode: "symbol" or "total"
-    holdings: dict of {symbol: value} (used if mode="symbol")
-    total_stock_value: float (used if mode="total")
-    """
-    if mode == "total":
-        stock_value = total_stock_value or 0
-    else:
-        stock_value = sum(holdings.values()) if holdings else 0
-
-    total_assets = fd_value + stock_value + mf_value
-    if total_assets == 0:
-        return 0, "No Investments"
-
-    risk_a = calc_market_cap_score(holdings, total_stock_value, mode)
-    risk_b = calc_fd_score(fd_value, stock_value)
-    risk_c = calc_mf_score(mf_value, stock_value, fd_value)
-
-    weights = {
-        "stocks": stock_value / total_assets if total_assets > 0 else 0,
-        "fd": fd_value / total_assets if total_assets > 0 else 0,
-        "mf": mf_value / total_assets if total_assets > 0 else 0,
-    }
-
-    final_score = (
-        risk_a * weights["stocks"] +
-        risk_b * weights["fd"] +
-        risk_c  # already weighted
-    )
-
-    return final_score, risk_tolerance_bucket(final_score)
-
 # --- API Endpoint to Calculate Risk Tolerance ---
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -376,42 +271,34 @@ def calculate_risk_tolerance(request):
         mode = request.data.get('mode', 'zerodha')  # 'zerodha' or 'manual'
         
         if mode == 'zerodha':
-            # Get Zerodha user data
-            try:
-                zerodha_user = ZerodhaUser.objects.get(user=request.user)
-            except ZerodhaUser.DoesNotExist:
-                return Response({
-                    "error": "Zerodha account not linked",
-                    "code": "ACCOUNT_NOT_LINKED",
-                    "action_required": "Please connect your Zerodha account first"
-                }, status=status.HTTP_404_NOT_FOUND)
+            # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+            zerodha_user, error_response = request.zerodha_session.resolve()
+            if error_response:
+                return error_response
             
-            # Check if token is expired
-            if is_token_expired(zerodha_user):
-                zerodha_user.delete()
-                return Response({
-                    "error": "Zerodha session has expired",
-                    "code": "SESSION_EXPIRED",
-                    "action_required": "Please reconnect your Zerodha account"
-                }, status=status.HTTP_401_UNAUTHORIZED)
+            # Client bound to this user's access token
+            kite_client = get_kite_client(zerodha_user.access_token)
             
-            # Set access token
-            kite.set_access_token(zerodha_user.access_token)
+            # Equity and MF holdings are independent, so fetch both at once;
+            # each result keeps its own error handling below
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                holdings_future = executor.submit(get_holdings, zerodha_user)
+                mf_holdings_future = executor.submit(kite_client.mf_holdings)
             
             # Fetch stock holdings from Zerodha
             try:
-                holdings_response = kite.holdings()
+                holdings_response = holdings_future.result()
                 stock_holdings = {}
                 total_stock_value = 0
                 
+                yfinance_symbols = []
                 for holding in holdings_response:
                     if holding['product'] == 'CNC':  # Only consider delivery holdings
                         symbol = holding['tradingsymbol']
                         current_value = holding['quantity'] * holding['last_price']
                         stock_holdings[symbol] = current_value
                         total_stock_value += current_value
-                stock_symbols = list(stock_holdings.keys())
-                yfinance_symbols = [symbol + ".NS" for symbol in stock_symbols]
+                        yfinance_symbols.append(to_yfinance_symbol(symbol, holding.get('exchange')))
                 print(f"Stock symbols from zerodha: {yfinance_symbols}")
                 print(f"Total stock value from zerodha: {total_stock_value}")
             except Exception as e:
@@ -426,7 +313,7 @@ def calculate_risk_tolerance(request):
             
             # Fetch mutual fund holdings from Zerodha
             try:
-                mf_holdings_response = kite.mf_holdings()
+                mf_holdings_response = mf_holdings_future.result()
                 total_mf_value = 0
                 
                 for mf_holding in mf_holdings_response:
@@ -449,7 +336,7 @@ def calculate_risk_tolerance(request):
             
             # Calculate risk tolerance
             risk_score, risk_category = calc_final_risk(
-                fd_value, holdings=stock_holdings, mf_value=total_mf_value, mode="symbol"
+                fd_value, holdings=stock_holdings, mf_value=total_mf_value, mode="symbol", cap_index=get_cap_index()
             )
             
             # Save risk profile
@@ -534,36 +421,15 @@ def get_user_stock_holdings(request):
     """Get user's Zerodha stock holdings and format them for yfinance analysis"""
     print(f"🔍 Backend: get_user_stock_holdings called for user: {request.user.username}")
     try:
-        # Check if user has Zerodha account linked
-        try:
-            zerodha_user = ZerodhaUser.objects.get(user=request.user)
-            print(f"🔍 Backend: Found Zerodha user: {zerodha_user.user_name}")
-        except ZerodhaUser.DoesNotExist:
-            print(f"🔍 Backend: No Zerodha account found for user: {request.user.username}")
-            return Response({
-                "error": "Zerodha account not linked",
-                "code": "ACCOUNT_NOT_LINKED",
-                "action_required": "Please connect your Zerodha account first"
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if token is expired
-        if is_token_expired(zerodha_user):
-            print(f"🔍 Backend: Token expired for user: {request.user.username}")
-            zerodha_user.delete()
-            return Response({
-                "error": "Zerodha session has expired",
-                "code": "SESSION_EXPIRED",
-                "action_required": "Please reconnect your Zerodha account"
-            }, status=status.HTTP_401_UNAUTHORIZED)
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
         
         try:
-            # Set access token
-            print(f"🔍 Backend: Setting access token for user: {request.user.username}")
-            kite.set_access_token(zerodha_user.access_token)
-            
-            # Fetch stock holdings from Zerodha
+            # Fetch stock holdings from Zerodha (shared short-lived snapshot)
             print(f"🔍 Backend: Fetching holdings from Zerodha API...")
-            holdings_response = kite.holdings()
+            holdings_response = get_holdings(zerodha_user)
             print(f"🔍 Backend: Raw holdings response length: {len(holdings_response)}")
             
             stock_holdings = []
@@ -577,8 +443,8 @@ def get_user_stock_holdings(request):
                     last_price = holding['last_price']
                     current_value = quantity * last_price
                     
-                    # Format symbol: uppercase + .NS suffix
-                    formatted_symbol = f"{symbol.upper()}.NS"
+                    # Resolve the yfinance ticker from the instrument master
+                    formatted_symbol = to_yfinance_symbol(symbol, holding.get('exchange'))
                     
                     print(f"🔍 Backend: Formatted symbol: {symbol} -> {formatted_symbol}")
                     print(f"🔍 Backend: Quantity: {quantity}, Price: {last_price}, Value: {current_value}")
@@ -636,6 +502,60 @@ def get_user_stock_holdings(request):
         traceback.print_exc()
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def calculate_risk_batch(request):
+    """
+    Score many portfolios in one call (e.g. an advisor's client spreadsheet).
+
+    Body: equal-length `fd_values`, `stock_values` and `mf_values` arrays, plus an
+    optional `holdings` array of {symbol: value} objects or nulls; a portfolio with
+    holdings is scored per symbol like Zerodha mode, otherwise like manual mode.
+    Nothing is stored. Results are returned in input order.
+    """
+    try:
+        fd_values = request.data.get('fd_values')
+        stock_values = request.data.get('stock_values')
+        mf_values = request.data.get('mf_values')
+        holdings = request.data.get('holdings')
+
+        columns = [fd_values, stock_values, mf_values]
+        if not all(isinstance(column, list) for column in columns):
+            return Response({"error": "fd_values, stock_values and mf_values must be arrays"}, status=status.HTTP_400_BAD_REQUEST)
+        count = len(fd_values)
+        if any(len(column) != count for column in columns) or (holdings is not None and (not isinstance(holdings, list) or len(holdings) != count)):
+            return Response({"error": "All arrays must have the same length"}, status=status.HTTP_400_BAD_REQUEST)
+        if count > settings.RISK_BATCH_MAX_PORTFOLIOS:
+            return Response({"error": f"At most {settings.RISK_BATCH_MAX_PORTFOLIOS} portfolios per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        def is_amount(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+        for column in columns:
+            if not all(is_amount(value) for value in column):
+                return Response({"error": "All values must be non-negative numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if holdings is not None:
+            for portfolio in holdings:
+                if portfolio is not None and not (
+                    isinstance(portfolio, dict) and all(is_amount(value) for value in portfolio.values())
+                ):
+                    return Response({"error": "holdings entries must be null or objects of non-negative numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        risk_scores, risk_categories = score_portfolios(
+            fd_values, stock_values, mf_values, holdings=holdings, cap_index=get_cap_index()
+        )
+        return Response({
+            "count": count,
+            "risk_scores": [round(float(score), 2) for score in risk_scores],
+            "risk_categories": risk_categories
+        })
+
+    except Exception as e:
+        print(f"❌ Error in calculate_risk_batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_risk_profile(request):
@@ -659,31 +579,14 @@ def get_risk_profile(request):
 def get_stock_details(request):
     """Fetch user's stock holdings from Zerodha, format symbols, and get details via yfinance"""
     try:
-        # 1. Check if Zerodha account is linked
-        try:
-            zerodha_user = ZerodhaUser.objects.get(user=request.user)
-            print(f"🔍 Backend: Found Zerodha user: {zerodha_user.user_name}")
-        except ZerodhaUser.DoesNotExist:
-            print(f"🔍 Backend: No Zerodha account found for user: {request.user.username}")
-            return Response({
-                "error": "Zerodha account not linked",
-                "code": "ACCOUNT_NOT_LINKED",
-                "action_required": "Please connect your Zerodha account first"
-            }, status=status.HTTP_404_NOT_FOUND)
-        print(f"ye hai Zerodha user: {zerodha_user}")
-        # 2. Check if token is expired
-        if is_token_expired(zerodha_user):
-            zerodha_user.delete()
-            return Response({
-                "error": "Zerodha session has expired",
-                "code": "SESSION_EXPIRED",
-                "action_required": "Please reconnect your Zerodha account"
-            }, status=status.HTTP_401_UNAUTHORIZED)
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
 
         # 3. Fetch stock holdings from Zerodha
         try:
-            kite.set_access_token(zerodha_user.access_token)
-            holdings_response = kite.holdings()
+            holdings_response = get_holdings(zerodha_user)
         except Exception as e:
             if handle_token_error(zerodha_user, str(e)):
                 return Response({
@@ -703,15 +606,7 @@ def get_stock_details(request):
         for holding in holdings_response:
             if holding['product'] == 'CNC':  # delivery holdings only
                 original_symbol = holding['tradingsymbol'].upper()
-                
-                # Apply symbol mapping rules
-                if original_symbol == "ONEPOINT-BE":
-                    yfinance_symbol = "ONEPOINT.NS"
-                elif original_symbol == "VIVANTA":
-                    yfinance_symbol = "VIVANTA.BO"
-                else:
-                    # Default: add .NS suffix
-                    yfinance_symbol = original_symbol + ".NS"
+                yfinance_symbol = to_yfinance_symbol(original_symbol, holding.get('exchange'))
                 
                 stock_symbols.append(yfinance_symbol)
                 symbol_mapping[yfinance_symbol] = original_symbol
@@ -728,40 +623,43 @@ def get_stock_details(request):
             print(f"🔍 Backend: No stock symbols found, returning empty response")
             return Response({"stocks": []})
         
-        # 5. Fetch stock details from yfinance
+        # 5. Fetch stock details from yfinance (live prices from the shared quote cache)
+        live_prices = get_quotes(stock_symbols)
+        history = price_store.get_history(stock_symbols)
+        # Unseen symbols are fetched concurrently; those that fail or time out are reported, not awaited
+        metadata = get_ticker_metadata(stock_symbols)
+        failed_symbols = [symbol for symbol in stock_symbols if symbol not in metadata]
         stocks_data = []
         for symbol in stock_symbols:
             try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
+                # A holding whose metadata failed is still listed, with the metadata fields null
+                has_metadata = symbol in metadata
+                info = metadata.get(symbol, {})
 
                 # Get original symbol for display
                 original_symbol = symbol_mapping.get(symbol, symbol)
                 
-                # Get live price using 1-minute interval data
-                try:
-                    live_price_data = ticker.history(period="1d", interval="1m").tail(1)
-                    if not live_price_data.empty:
-                        live_price = live_price_data["Close"].values[0]
-                    else:
-                        live_price = info.get("currentPrice")
-                except Exception as e:
-                    live_price = info.get("currentPrice")
-                    import traceback
-                    traceback.print_exc()
+                # Live price from the quote cache, falling back to info
+                live_price = live_prices.get(symbol, info.get("currentPrice"))
+
+                # Daily history from the local price store fills gaps in info
+                hist = history.get(symbol)
+                last_year = hist[hist.index >= hist.index[-1] - timedelta(days=365)] if hist is not None else None
+                before_today = hist[hist.index.date < datetime.now().date()] if hist is not None else None
+                store_previous_close = before_today["Close"].iloc[-1] if before_today is not None and len(before_today) else None
 
                 stock_info = {
                     "symbol": symbol,  # yfinance symbol for API calls
                     "originalSymbol": original_symbol,  # original symbol for display
-                    "longName": info.get("longName", original_symbol),
-                    "sector": info.get("sector", "N/A"),
+                    "longName": info.get("longName", original_symbol) if has_metadata else None,
+                    "sector": info.get("sector", "N/A") if has_metadata else None,
                     "currentPrice": live_price,
-                    "previousClose": info.get("previousClose"),
+                    "previousClose": info.get("previousClose", store_previous_close),
                     "marketCap": info.get("marketCap"),
                     "dayHigh": info.get("dayHigh"),
                     "dayLow": info.get("dayLow"),
-                    "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh"),
-                    "fiftyTwoWeekLow": info.get("fiftyTwoWeekLow"),
+                    "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh", last_year["High"].max() if last_year is not None else None),
+                    "fiftyTwoWeekLow": info.get("fiftyTwoWeekLow", last_year["Low"].min() if last_year is not None else None),
                     # Investment data from holdings
                     "quantity": holdings_data.get(symbol, {}).get('quantity', 0),
                     "averagePrice": holdings_data.get(symbol, {}).get('average_price', 0),
@@ -790,7 +688,8 @@ def get_stock_details(request):
                 "total_current_value": total_current_value,
                 "total_quantity": total_quantity,
                 "total_stocks": len(stocks_data)
-            }
+            },
+            "failed_symbols": failed_symbols
         })
 
     except Exception as e:
@@ -799,6 +698,66 @@ def get_stock_details(request):
         traceback.print_exc()
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer])
+def stream_portfolio_valuation(request):
+    """Server-sent events with the user's holdings valuation, pushed as quotes change"""
+    try:
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
+
+        try:
+            holdings_response = get_holdings(zerodha_user)
+        except Exception as e:
+            if handle_token_error(zerodha_user, str(e)):
+                return Response({
+                    "error": "Zerodha session has expired",
+                    "code": "SESSION_EXPIRED",
+                    "action_required": "Please reconnect your Zerodha account"
+                }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response({"error": f"Failed to fetch holdings: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Positions are resolved once per connection; the stream only re-reads quotes
+        positions = {}
+        for holding in holdings_response:
+            if holding['product'] == 'CNC':  # delivery holdings only
+                positions[to_yfinance_symbol(holding['tradingsymbol'], holding.get('exchange'))] = {
+                    'quantity': holding['quantity'],
+                    'average_price': holding['average_price'],
+                    'previous_close': holding.get('close_price'),
+                }
+        missing_close = [symbol for symbol, position in positions.items() if not position['previous_close']]
+        if missing_close:
+            history = price_store.get_history(missing_close)
+            for symbol in missing_close:
+                hist = history.get(symbol)
+                before_today = hist[hist.index.date < datetime.now().date()] if hist is not None else None
+                if before_today is not None and len(before_today):
+                    positions[symbol]['previous_close'] = float(before_today["Close"].iloc[-1])
+
+        valuation = PortfolioValuation(positions)
+        prices = get_quotes(valuation.symbols)
+        print(f"🔍 Backend: Streaming valuation of {len(positions)} holdings for user: {request.user.username}")
+
+        if isinstance(request._request, ASGIRequest):
+            events = astream_events(valuation, prices)
+        else:
+            events = stream_events(valuation, prices)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Keep reverse proxies (nginx) from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    except Exception as e:
+        print(f"❌ Error in stream_portfolio_valuation: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def test_auth(request):
@@ -813,8 +772,15 @@ def test_auth(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(list(api_settings.DEFAULT_RENDERER_CLASSES) + [CompactChartRenderer])
 def get_stock_data(request):
-    """Fetch historical stock data for charts with multiple time periods"""
+    """
+    Fetch historical stock data for charts with multiple time periods.
+
+    Clients that send `Accept: application/vnd.wealthwise.compact+json` (or
+    "encoding": "compact" in the body) get the compact columnar encoding from
+    utils/encoding.py; everyone else gets the per-period nested shape.
+    """
     try:
         print(f"🔍 Backend: get_stock_data called for user: {request.user.username}")
         stock_symbols = request.data.get("symbols", [])
@@ -822,85 +788,36 @@ def get_stock_data(request):
         print(f"🔍 Backend: Request data: {request.data}")
         print(f"🔍 Backend: Request body: {request.body}")
 
-        stock_data = {}
-        for symbol in stock_symbols:
-            try:
-                print(f"🔍 Backend: Fetching chart data for {symbol}")
-                stock = yf.Ticker(symbol)
-                
-                # Fetch data for different time periods
-                periods = {
-                    "7d": "7d",
-                    "1mo": "1mo", 
-                    "3mo": "3mo",
-                    "6mo": "6mo",
-                    "1y": "1y",
-                    "2y": "2y",
-                    "5y": "5y"
-                }
-                
-                period_data = {}
-                
-                for period_name, period_value in periods.items():
-                    try:
-                        print(f"🔍 Backend: Fetching {period_name} data for {symbol}")
-                        hist = stock.history(period=period_value)
-                        
-                        if not hist.empty:
-                            # Get live price using 1-minute interval data for consistency
-                            try:
-                                print(f"🔍 Backend: Attempting to get live price for {period_name} chart {symbol}")
-                                live_price_data = stock.history(period="1d", interval="1m").tail(1)
-                                
-                                if not live_price_data.empty:
-                                    live_price = live_price_data["Close"].values[0]
-                                    print(f"🔍 Backend: Live price for {period_name} chart {symbol}: {live_price}")
-                                else:
-                                    live_price = hist["Close"].iloc[-1]
-                                    print(f"🔍 Backend: Using last close for {period_name} chart {symbol}: {live_price}")
-                            except Exception as e:
-                                live_price = hist["Close"].iloc[-1]
-                                print(f"🔍 Backend: Error getting live price for {period_name} chart {symbol}, using last close: {e}")
-                            
-                            # Calculate performance metrics
-                            start_price = hist["Close"].iloc[0]
-                            end_price = hist["Close"].iloc[-1]
-                            total_return = ((end_price - start_price) / start_price) * 100
-                            
-                            # Calculate volatility (standard deviation of returns)
-                            returns = hist["Close"].pct_change().dropna()
-                            volatility = returns.std() * 100
-                            
-                            period_data[period_name] = {
-                                "current_price": live_price,
-                                "history": hist["Close"].tolist(),
-                                "dates": hist.index.strftime("%Y-%m-%d").tolist(),
-                                "start_price": start_price,
-                                "end_price": end_price,
-                                "total_return": round(total_return, 2),
-                                "volatility": round(volatility, 2),
-                                "data_points": len(hist)
-                            }
-                            
-                            print(f"🔍 Backend: {period_name} data for {symbol}: {len(hist)} data points, return: {total_return:.2f}%, volatility: {volatility:.2f}%")
-                        else:
-                            print(f"⚠️ Backend: No {period_name} historical data for {symbol}")
-                            
-                    except Exception as e:
-                        print(f"⚠️ Backend: Error fetching {period_name} data for {symbol}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                
-                if period_data:
-                    stock_data[symbol] = period_data
-                    print(f"🔍 Backend: Chart data collected for {symbol}: {list(period_data.keys())}")
-                else:
-                    print(f"⚠️ Backend: No chart data collected for {symbol}")
-                    
-            except Exception as e:
-                print(f"⚠️ Backend: Error fetching chart data for {symbol}: {e}")
-                import traceback
-                traceback.print_exc()
+        # Optional cap on points drawn per series; metrics always use the full series
+        max_points = request.data.get("max_points")
+        if max_points is not None:
+            if not isinstance(max_points, int) or isinstance(max_points, bool) or max_points < MIN_POINTS:
+                return Response(
+                    {"error": f"max_points must be an integer of at least {MIN_POINTS}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Each batch is fetched concurrently; a slow batch only costs its own symbols
+        print(f"🔍 Backend: Fetching chart data for {len(stock_symbols)} symbols")
+        symbol_batches = [tuple(batch) for batch in batches(list(dict.fromkeys(stock_symbols)))]
+        batch_results, _ = fan_out(lambda batch: load_chart_inputs(list(batch)), symbol_batches)
+        chart_inputs = {}
+        for batch_inputs in batch_results.values():
+            chart_inputs.update(batch_inputs)
+
+        compact = (
+            isinstance(request.accepted_renderer, CompactChartRenderer)
+            or request.data.get("encoding") == "compact"
+        )
+        if compact:
+            compact_data = encode_compact(chart_inputs, {name: period_cutoff(name) for name in PERIODS})
+            failed_symbols = [symbol for symbol in stock_symbols if symbol not in compact_data["symbols"]]
+            return Response({"data": compact_data, "failed_symbols": failed_symbols})
+
+        stock_data = build_chart_data(chart_inputs, max_points=max_points)
+        failed_symbols = [symbol for symbol in stock_symbols if symbol not in stock_data]
+        for symbol in failed_symbols:
+            print(f"⚠️ Backend: No chart data collected for {symbol}")
 
         print(f"🔍 Backend: Total chart data collected: {len(stock_data)} symbols")
         print(f"🔍 Backend: Chart data structure: {stock_data}")
@@ -911,10 +828,138 @@ def get_stock_data(request):
             for period, period_info in data.items():
                 print(f"🔍 Backend: {period} data for {symbol}: {period_info.get('data_points', 0)} points, return: {period_info.get('total_return', 0)}%, volatility: {period_info.get('volatility', 0)}%")
         
-        return Response({"data": stock_data})
+        return Response({"data": stock_data, "failed_symbols": failed_symbols})
         
     except Exception as e:
         print(f"❌ Backend: Error in get_stock_data: {str(e)}")
         import traceback
         traceback.print_exc()
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_holdings_correlation(request):
+    """Covariance and correlation matrices of the user's holdings' daily returns over a window of days"""
+    try:
+        try:
+            window = int(request.query_params.get('window', 90))
+        except ValueError:
+            return Response({"error": "window must be a number of days"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 2 <= window <= 5 * 365:
+            return Response({"error": "window must be between 2 and 1825 days"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
+
+        try:
+            holdings_response = get_holdings(zerodha_user)
+        except Exception as e:
+            if handle_token_error(zerodha_user, str(e)):
+                return Response({
+                    "error": "Zerodha session has expired",
+                    "code": "SESSION_EXPIRED",
+                    "action_required": "Please reconnect your Zerodha account"
+                }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response({"error": f"Failed to fetch holdings: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        stock_symbols = [
+            to_yfinance_symbol(holding['tradingsymbol'], holding.get('exchange'))
+            for holding in holdings_response
+            if holding['product'] == 'CNC'
+        ]
+        as_of = session_date()
+        symbols, covariance, correlation = covariance_matrices(stock_symbols, window, as_of)
+
+        return Response({
+            "symbols": symbols,
+            "window": window,
+            "as_of": as_of.isoformat(),
+            "covariance": matrix_to_list(covariance),
+            "correlation": matrix_to_list(correlation),
+            "missing_symbols": [symbol for symbol in stock_symbols if symbol not in symbols]
+        })
+
+    except Exception as e:
+        print(f"❌ Error in get_holdings_correlation: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_value_at_risk(request):
+    """1-day and 10-day historical and parametric VaR / Expected Shortfall of the user's holdings over a lookback of days"""
+    try:
+        try:
+            lookback = int(request.query_params.get('lookback', settings.VALUE_AT_RISK_LOOKBACK_DAYS))
+        except ValueError:
+            return Response({"error": "lookback must be a number of days"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 90 <= lookback <= 10 * 365:
+            return Response({"error": "lookback must be between 90 and 3650 days"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Zerodha account resolved once per request by ZerodhaSessionMiddleware
+        zerodha_user, error_response = request.zerodha_session.resolve()
+        if error_response:
+            return error_response
+
+        try:
+            holdings_response = get_holdings(zerodha_user)
+        except Exception as e:
+            if handle_token_error(zerodha_user, str(e)):
+                return Response({
+                    "error": "Zerodha session has expired",
+                    "code": "SESSION_EXPIRED",
+                    "action_required": "Please reconnect your Zerodha account"
+                }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response({"error": f"Failed to fetch holdings: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        positions = {}
+        for holding in holdings_response:
+            if holding['product'] == 'CNC':  # Only consider delivery holdings
+                symbol = to_yfinance_symbol(holding['tradingsymbol'], holding.get('exchange'))
+                positions[symbol] = positions.get(symbol, 0) + holding['quantity'] * holding['last_price']
+
+        as_of = session_date()
+        result = value_at_risk(positions, as_of, lookback)
+        return Response({
+            **result,
+            "lookback": lookback,
+            "as_of": as_of.isoformat()
+        })
+
+    except Exception as e:
+        print(f"❌ Error in get_value_at_risk: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_portfolio_history(request):
+    """Total value of the user's recorded holdings per day, optionally between `start` and `end` (YYYY-MM-DD)"""
+    try:
+        try:
+            start = datetime.strptime(request.query_params['start'], "%Y-%m-%d").date() if request.query_params.get('start') else None
+            end = datetime.strptime(request.query_params['end'], "%Y-%m-%d").date() if request.query_params.get('end') else None
+        except ValueError:
+            return Response({"error": "start and end must be dates in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+        if start and end and start > end:
+            return Response({"error": "start must not be after end"}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = portfolio_value_series(request.user, start, end)
+        return Response({
+            "series": [
+                {"date": point['date'].isoformat(), "value": point['value'], "holdings": point['holdings']}
+                for point in series
+            ],
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None
+        })
+
+    except Exception as e:
+        print(f"❌ Error in get_portfolio_history: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -6,6 +6,7 @@ from django.contrib.auth.models import User
 from .models import LifeExpectancy
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.conf import settings
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the Django User model"""
@@ -142,4 +143,57 @@ class UserLoginSerializer(serializers.Serializer):
         else:
             raise serializers.ValidationError("Email and password are required.")
 
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+class RetirementSimulationSerializer(serializers.Serializer):
+    """Overrides for a retirement simulation; anything left out comes from the user's saved profile"""
+    current_age = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    retirement_age = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    life_expectancy = serializers.FloatField(min_value=1, max_value=120, required=False)
+    initial_corpus = serializers.FloatField(min_value=0, required=False)
+    monthly_contribution = serializers.FloatField(min_value=0, required=False)
+    monthly_expense = serializers.FloatField(min_value=0, required=False)
+    # Annual rates in percent, like the dashboard charts
+    expected_return = serializers.FloatField(min_value=-50, max_value=50, required=False)
+    volatility = serializers.FloatField(min_value=0, max_value=100, required=False)
+    post_retirement_return = serializers.FloatField(min_value=-50, max_value=50, required=False)
+    post_retirement_volatility = serializers.FloatField(min_value=0, max_value=100, required=False)
+    paths = serializers.IntegerField(min_value=1, max_value=settings.RETIREMENT_SIMULATION_MAX_PATHS, required=False)
+    seed = serializers.IntegerField(min_value=0, max_value=2 ** 32 - 1, required=False)
+
+
+class BreakEvenGridSerializer(serializers.Serializer):
+    """Scenario grid for the annuity vs lump-sum break-even; rates are annual percentages"""
+    lump_sum = serializers.FloatField(min_value=1, default=5000000)
+    annuity_rates = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=100), min_length=1, default=[7]
+    )
+    escalation_rates = serializers.ListField(
+        child=serializers.FloatField(min_value=-50, max_value=50), min_length=1, default=[0]
+    )
+    # Each entry is a constant rate or a year-by-year path
+    inflation = serializers.ListField(child=serializers.JSONField(), min_length=1, default=[5])
+    nominal_return = serializers.FloatField(min_value=-50, max_value=50, default=8)
+    horizon = serializers.IntegerField(min_value=1, max_value=60, default=35)
+    start_age = serializers.IntegerField(min_value=0, max_value=100, default=60)
+
+    def validate_inflation(self, value):
+        def is_rate(rate):
+            return isinstance(rate, (int, float)) and not isinstance(rate, bool) and -50 <= rate <= 100
+
+        for path in value:
+            rates = path if isinstance(path, list) else [path]
+            if not rates or not all(is_rate(rate) for rate in rates):
+                raise serializers.ValidationError(
+                    "Each entry must be a rate or a non-empty list of rates between -50 and 100"
+                )
+        return value
+
+    def validate(self, data):
+        scenarios = len(data["annuity_rates"]) * len(data["escalation_rates"]) * len(data["inflation"])
+        if scenarios > settings.BREAK_EVEN_MAX_SCENARIOS:
+            raise serializers.ValidationError(
+                f"At most {settings.BREAK_EVEN_MAX_SCENARIOS} scenarios per request (got {scenarios})"
+            )
+        return data
@@ -1,3 +1,269 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import IncomeStatus, RetirementInfo, UserData
+from users.utils import retirement_simulation
+from users.utils.break_even import break_even_grid
+from users.utils.retirement_simulation import InflationModel, simulate_retirement
+from users.utils.scenario_sweep import sweep_surface
+
+
+class BreakEvenGridTests(SimpleTestCase):
+    def grid(self, **inputs):
+        defaults = {
+            "lump_sum": 1000000, "annuity_rates": [10], "escalation_rates": [0], "inflation": [0],
+            "nominal_return": 0, "horizon": 30, "start_age": 60,
+        }
+        return break_even_grid(**{**defaults, **inputs})
+
+    def test_without_growth_the_annuity_repays_the_lump_sum_in_ten_years(self):
+        result = self.grid()
+        self.assertEqual(result["break_even_year"], [[[10.0]]])
+        self.assertEqual(result["break_even_age"], [[[70.0]]])
+        self.assertEqual(result["final_difference"], [[[2000000.0]]])
+
+    def test_never_breaking_even(self):
+        result = self.grid(annuity_rates=[1], horizon=20)
+        self.assertEqual(result["break_even_age"], [[[None]]])
+        self.assertEqual(result["final_difference"], [[[-800000.0]]])
+
+    def test_grid_is_indexed_escalation_inflation_annuity_rate(self):
+        result = self.grid(annuity_rates=[5, 8, 10], escalation_rates=[0, 3], inflation=[4, [6, 5, 4]], nominal_return=8)
+        ages = result["break_even_age"]
+        self.assertEqual((len(ages), len(ages[0]), len(ages[0][0])), (2, 2, 3))
+        # A higher annuity rate or escalation breaks even no later
+        for by_inflation in ages:
+            for by_rate in by_inflation:
+                known = [age for age in by_rate if age is not None]
+                self.assertEqual(known, sorted(known, reverse=True))
+        self.assertLessEqual(ages[1][0][2], ages[0][0][2])
+
+
+class BreakEvenGridViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("retiree", "retiree@example.com", "password"))
+        self.url = reverse("calculate_break_even_grid")
+
+    def test_defaults(self):
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inputs"]["annuity_rates"], [7])
+        self.assertEqual(len(response.data["break_even_age"]), 1)
+
+    def test_rejects_invalid_input(self):
+        invalid = {
+            "empty annuity rates": {"annuity_rates": []},
+            "annuity rate above 100": {"annuity_rates": [101]},
+            "zero horizon": {"horizon": 0},
+            "inflation as text": {"inflation": ["5"]},
+            "empty inflation path": {"inflation": [[]]},
+            "boolean in inflation path": {"inflation": [[5, True]]},
+            "inflation out of range": {"inflation": [150]},
+            "zero lump sum": {"lump_sum": 0},
+        }
+        for case, body in invalid.items():
+            with self.subTest(case):
+                response = self.client.post(self.url, body, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BREAK_EVEN_MAX_SCENARIOS=8)
+    def test_rejects_too_many_scenarios(self):
+        body = {"annuity_rates": [5, 6, 7], "escalation_rates": [0, 1, 2], "inflation": [4]}
+        response = self.client.post(self.url, body, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        response = APIClient().post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SweepSurfaceTests(SimpleTestCase):
+    def surface(self, **inputs):
+        defaults = {
+            "current_age": 30, "life_expectancy": 80, "initial_corpus": 100000, "monthly_contribution": 1000,
+            "monthly_expense": 5000, "retirement_ages": [60], "returns": [0], "inflation_rates": [0],
+        }
+        return sweep_surface(**{**defaults, **inputs})
+
+    def test_without_growth(self):
+        surface = self.surface()
+        corpus = 100000 + 1000 * 360
+        self.assertAlmostEqual(surface["corpus_at_retirement"][0, 0, 0], corpus)
+        self.assertAlmostEqual(surface["sustainable_monthly_withdrawal"][0, 0, 0], corpus / 240)
+        self.assertAlmostEqual(surface["funded_ratio"][0, 0, 0], corpus / 240 / 5000)
+
+    def test_matches_a_month_by_month_projection(self):
+        surface = self.surface(returns=[8], inflation_rates=[6])
+        monthly_return, monthly_inflation = 1.08 ** (1 / 12) - 1, 1.06 ** (1 / 12) - 1
+        corpus, contribution = 100000.0, 1000.0
+        for _ in range(360):
+            contribution *= 1 + monthly_inflation
+            corpus = corpus * (1 + monthly_return) + contribution
+        self.assertAlmostEqual(surface["corpus_at_retirement"][0, 0, 0] / corpus, 1, places=10)
+
+        # Withdrawing the sustainable amount (in today's money) empties the corpus at life expectancy
+        withdrawal = surface["sustainable_monthly_withdrawal"][0, 0, 0] * (1 + monthly_inflation) ** 360
+        for _ in range(240):
+            withdrawal *= 1 + monthly_inflation
+            corpus = corpus * (1 + monthly_return) - withdrawal
+        self.assertAlmostEqual(corpus / surface["corpus_at_retirement"][0, 0, 0], 0, places=8)
+
+    def test_retiring_at_life_expectancy_has_no_withdrawal(self):
+        surface = self.surface(retirement_ages=[70, 80], returns=[5, 10], inflation_rates=[3])
+        self.assertEqual(surface["corpus_at_retirement"].shape, (2, 2, 1))
+        self.assertFalse(np.isnan(surface["sustainable_monthly_withdrawal"][0]).any())
+        self.assertTrue(np.isnan(surface["sustainable_monthly_withdrawal"][1]).all())
+
+
+class RetirementSweepViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("retiree", "retiree@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("retirement_scenario_sweep")
+
+    def complete_profile(self):
+        UserData.objects.create(user=self.user, dateOfBirth=date(1990, 1, 1))
+        IncomeStatus.objects.create(
+            user=self.user, currentSalary=100000, yearsOfService=5, employerType="private",
+            pensionScheme="NPS", pensionBalance=500000, employerContribution=5000, yourContribution=5000,
+        )
+        RetirementInfo.objects.create(
+            user=self.user, plannedRetirementAge=60, retirementLifestyle="comfortable",
+            monthlyRetirementExpense=50000, legacyGoal="maximize-income",
+        )
+
+    def test_incomplete_profile(self):
+        UserData.objects.create(user=self.user, dateOfBirth=date(1990, 1, 1))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["missing"],
+            ["retirement_age", "initial_corpus", "monthly_contribution", "monthly_expense"],
+        )
+
+    @override_settings(RETIREMENT_SWEEP_AGE_SPAN=2, RETIREMENT_SWEEP_RETURNS=(6, 8, 1), RETIREMENT_SWEEP_INFLATION=(4, 5, 1))
+    def test_surface_follows_the_saved_profile(self):
+        self.complete_profile()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["retirement_ages"], [58, 59, 60, 61, 62])
+        self.assertEqual(response.data["returns"], [6.0, 7.0, 8.0])
+        self.assertEqual(response.data["inflation"], [4.0, 5.0])
+        self.assertEqual(np.shape(response.data["corpus_at_retirement"]), (5, 3, 2))
+
+        # A profile change is a new version, not the cached surface
+        RetirementInfo.objects.filter(user=self.user).update(monthlyRetirementExpense=60000)
+        updated = self.client.get(self.url)
+        self.assertNotEqual(updated.data["version"], response.data["version"])
+        self.assertEqual(updated.data["inputs"]["monthly_expense"], 60000.0)
+
+    def test_requires_authentication(self):
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RetirementSimulationTests(SimpleTestCase):
+    def simulate(self, **inputs):
+        defaults = {
+            "current_age": 30, "retirement_age": 60, "life_expectancy": 85, "initial_corpus": 500000,
+            "monthly_contribution": 10000, "monthly_expense": 30000, "expected_return": 0.10, "volatility": 0.15,
+            "post_retirement_return": 0.07, "post_retirement_volatility": 0.08, "paths": 2000, "seed": 7,
+        }
+        return simulate_retirement(**{**defaults, **inputs})
+
+    def test_seeded_runs_repeat(self):
+        result = self.simulate()
+        self.assertEqual(self.simulate(), result)
+        self.assertNotEqual(self.simulate(seed=8)["bands"], result["bands"])
+        self.assertEqual(result["seed"], 7)
+
+    def test_percentiles_are_ordered(self):
+        result = self.simulate(paths=1001)
+        self.assertEqual(len(result["ages"]), 55)
+        for bands in (result["bands"], result["real_bands"]):
+            rows = np.array([bands[str(p)] for p in result["percentiles"]])
+            self.assertEqual(rows.shape, (5, 55))
+            self.assertTrue((np.diff(rows, axis=0) >= 0).all())
+        by_age = result["ruin_probability_by_age"]
+        self.assertEqual(by_age, sorted(by_age))
+        self.assertEqual(by_age[-1], result["ruin_probability"])
+
+    @mock.patch.object(retirement_simulation, "inflation_model", return_value=InflationModel(0.0, 0.5, 0.0, 0.0))
+    def test_without_volatility_or_inflation_matches_the_closed_form(self, _):
+        result = self.simulate(volatility=0, post_retirement_volatility=0, monthly_expense=250000)
+        saving_growth, retired_growth = 1.10 ** (1 / 12), 1.07 ** (1 / 12)
+
+        months = 30 * 12
+        at_retirement = 500000 * saving_growth ** months + 10000 * (saving_growth ** months - 1) / (saving_growth - 1)
+        self.assertAlmostEqual(result["median_corpus_at_retirement"] / at_retirement, 1, places=5)
+
+        # Year-end corpus of the month-by-month recurrence, until the expense cannot be met
+        corpus, year_ends, ruin_age = 500000.0, [], None
+        for month in range(1, 55 * 12 + 1):
+            if month <= months:
+                corpus = corpus * saving_growth + 10000
+            else:
+                corpus = corpus * retired_growth - 250000
+                if corpus < 0 and ruin_age is None:
+                    ruin_age = 30 + (month - 1) // 12 + 1
+            if month % 12 == 0:
+                year_ends.append(max(corpus, 0.0))
+        self.assertIsNotNone(ruin_age)
+        for p in result["percentiles"]:
+            np.testing.assert_allclose(result["bands"][str(p)], year_ends, rtol=1e-5)
+            self.assertEqual(result["real_bands"][str(p)], result["bands"][str(p)])
+        self.assertEqual(result["ruin_probability"], 1.0)
+        self.assertEqual(result["ruin_probability_by_age"], [float(age >= ruin_age) for age in result["ages"]])
+
+
+class RetirementSimulationViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("retiree", "retiree@example.com", "password"))
+        self.url = reverse("simulate_retirement_corpus")
+        self.overrides = {
+            "current_age": 30, "retirement_age": 60, "initial_corpus": 500000, "monthly_contribution": 10000,
+            "monthly_expense": 30000, "paths": 200, "seed": 1,
+        }
+
+    def test_overrides_stand_in_for_the_profile(self):
+        response = self.client.get(self.url, self.overrides)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["paths"], response.data["seed"]), (200, 1))
+        self.assertEqual(response.data["inputs"]["expected_return"], settings.RETIREMENT_EXPECTED_RETURN)
+
+    def test_rejects_invalid_overrides(self):
+        invalid = {
+            "age as text": {"current_age": "thirty"},
+            "negative corpus": {"initial_corpus": -1},
+            "volatility above 100": {"volatility": 101},
+            "zero paths": {"paths": 0},
+            "too many paths": {"paths": settings.RETIREMENT_SIMULATION_MAX_PATHS + 1},
+            "negative seed": {"seed": -1},
+            "retiring before today": {"current_age": 40, "retirement_age": 35},
+        }
+        for case, params in invalid.items():
+            with self.subTest(case):
+                response = self.client.get(self.url, {**self.overrides, **params})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incomplete_profile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["missing"],
+            ["current_age", "retirement_age", "initial_corpus", "monthly_contribution", "monthly_expense"],
+        )
@@ -19,6 +19,9 @@ urlpatterns = [
     path("income/list/", views.list_income_status, name="list_income_status"),
     path("retirement/add/", views.add_retirement_info, name="add_retirement_info"),
     path("retirement/list/", views.list_retirement_info, name="list_retirement_info"),
+    path("retirement/simulate/", views.simulate_retirement_corpus, name="simulate_retirement_corpus"),
+    path("retirement/break-even/", views.calculate_break_even_grid, name="calculate_break_even_grid"),
+    path("retirement/sweep/", views.retirement_scenario_sweep, name="retirement_scenario_sweep"),
     path('user/add/', views.add_user_data, name='add_user_data'),
     path('user/get/', views.get_user_data, name='get_user_data'),
     path("life-expectancy/add/", views.add_life_expectancy, name="add_life_expectancy"),
@@ -0,0 +1,103 @@
+"""
+Annuity vs lump-sum break-even over a grid of scenarios.
+
+The same comparison as the dashboard's BreakEvenChart, in real
+(inflation-adjusted) terms: the lump sum is invested at the real return, and
+each year's annuity payment (stepped up by the escalation rate) is deflated
+to today's money and invested as it arrives. Break-even is the first age at
+which the annuity side is worth at least as much, interpolated within the
+year like the chart does.
+
+Every (escalation, inflation, annuity rate) combination is evaluated at once
+as an escalations x inflations x annuity rates x years array. Results are
+cached by a hash of the inputs.
+"""
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+
+def inflation_matrix(inflation, years):
+    """
+    (paths x years) annual inflation fractions from a list whose entries are
+    either a constant rate or a year-by-year path (percent); a path shorter
+    than the horizon keeps its last rate.
+    """
+    matrix = np.empty((len(inflation), years))
+    for row, path in enumerate(inflation):
+        rates = np.atleast_1d(np.asarray(path, dtype="f8"))[:years]
+        matrix[row, :len(rates)] = rates
+        matrix[row, len(rates):] = rates[-1]
+    return matrix / 100
+
+
+def break_even_grid(lump_sum, annuity_rates, escalation_rates, inflation, nominal_return, horizon, start_age):
+    """
+    Break-even of every (escalation, inflation, annuity rate) scenario.
+
+    annuity_rates: first-year annuity as a percentage of the lump sum
+    escalation_rates: annual step-up of the annuity, percent
+    inflation: constant rates or year-by-year paths, percent
+    nominal_return: annual return on invested money, percent
+
+    Returns nested lists indexed [escalation][inflation][annuity rate]:
+    break-even age and year (None if the annuity never catches up within
+    the horizon) and the real difference (annuity - lump sum) at the horizon.
+    """
+    years = np.arange(1, horizon + 1)
+    inflation_rates = inflation_matrix(inflation, horizon)  # (I, T)
+    escalation = np.asarray(escalation_rates, dtype="f8") / 100  # (E,)
+    annuity = np.asarray(annuity_rates, dtype="f8") / 100 * lump_sum  # (A,)
+
+    # Cumulative real growth D_t and price level P_t per inflation path
+    log_price = np.cumsum(np.log1p(inflation_rates), axis=1)
+    log_growth = years * np.log1p(nominal_return / 100) - log_price
+
+    # Real value of each year's payment, discounted back by D_t: (E, I, A, T)
+    payment = annuity[None, None, :, None] * np.exp(
+        (years - 1) * np.log1p(escalation)[:, None, None, None]
+        - log_price[None, :, None, :]
+        - log_growth[None, :, None, :]
+    )
+    # Annuity minus lump sum, in real terms: D_t * (sum of discounted payments - L)
+    discounted = np.cumsum(payment, axis=-1) - lump_sum
+    growth = np.exp(log_growth)[None, :, None, :]
+    difference = np.concatenate(
+        [np.full(discounted.shape[:-1] + (1,), -float(lump_sum)), discounted * growth], axis=-1
+    )  # year 0 .. horizon
+
+    reached = difference[..., 1:] >= 0
+    found = reached.any(axis=-1)
+    year = np.argmax(reached, axis=-1) + 1
+    before = np.take_along_axis(difference, (year - 1)[..., None], axis=-1)[..., 0]
+    after = np.take_along_axis(difference, year[..., None], axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(after == before, 0.0, -before / (after - before))
+    break_even_year = np.where(found, year - 1 + np.clip(fraction, 0, 1), np.nan)
+
+    def to_list(values, digits):
+        return np.vectorize(lambda v: None if np.isnan(v) else round(float(v), digits), otypes=[object])(values).tolist()
+
+    return {
+        "break_even_age": to_list(start_age + break_even_year, 2),
+        "break_even_year": to_list(break_even_year, 2),
+        "final_difference": to_list(difference[..., -1], 2),
+    }
+
+
+def inputs_hash(inputs):
+    """Stable digest of the calculator inputs"""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def cached_break_even_grid(**inputs):
+    """break_even_grid, cached by a hash of its inputs"""
+    cache_key = f"break_even_{inputs_hash(inputs)}"
+    result = cache.get(cache_key)
+    if result is None:
+        result = break_even_grid(**inputs)
+        cache.set(cache_key, result, timeout=settings.BREAK_EVEN_CACHE_TIMEOUT)
+    return result
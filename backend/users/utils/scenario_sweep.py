@@ -0,0 +1,131 @@
+"""
+What-if surface for retirement planning.
+
+For every (retirement age, expected return, inflation) on a fixed grid this
+gives the corpus at retirement and the monthly withdrawal it can sustain until
+life expectancy, so the dashboard sliders only read from one precomputed
+surface. The model is deterministic and monthly:
+
+- contributions (today's money, rising with inflation) and returns compound
+  until retirement;
+- after retirement the corpus pays a withdrawal that keeps its purchasing
+  power and runs out exactly at life expectancy.
+
+Both phases have closed forms (geometric series), so the whole grid is one
+broadcasted retirement ages x returns x inflation array computation. The
+surface is cached per user under a hash of the saved profile inputs it is
+built from, which changes whenever IncomeStatus, RetirementInfo (or the other
+inputs) change.
+"""
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from users.utils.retirement_simulation import saved_inputs
+
+
+REQUIRED_INPUTS = ("current_age", "retirement_age", "initial_corpus", "monthly_contribution", "monthly_expense")
+
+
+def grid_axis(start, stop, step):
+    """Inclusive range of percentages"""
+    return [round(float(value), 4) for value in np.arange(start, stop + step / 2, step)]
+
+
+def _geometric_sum(ratio, terms):
+    """sum(ratio ** m for m in 1..terms), elementwise"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.isclose(ratio, 1), terms, ratio * (1 - ratio ** terms) / (1 - ratio))
+
+
+def sweep_surface(current_age, life_expectancy, initial_corpus, monthly_contribution, monthly_expense,
+                  retirement_ages, returns, inflation_rates):
+    """
+    Arrays indexed [retirement age][return][inflation] (rates in percent):
+    nominal and real corpus at retirement, the sustainable monthly withdrawal
+    in today's money (NaN when retiring at or after life expectancy) and that
+    withdrawal as a share of the planned monthly expense.
+    """
+    ages = np.asarray(retirement_ages, dtype="f8")[:, None, None]
+    monthly_return = (1 + np.asarray(returns, dtype="f8")[None, :, None] / 100) ** (1 / 12) - 1
+    monthly_inflation = (1 + np.asarray(inflation_rates, dtype="f8")[None, None, :] / 100) ** (1 / 12) - 1
+
+    # Accumulation: contribution at the end of month m is C * (1 + i)^m and grows for n - m months
+    saving_months = (ages - current_age) * 12
+    growth = (1 + monthly_return) ** saving_months
+    contributions = monthly_contribution * growth * _geometric_sum((1 + monthly_inflation) / (1 + monthly_return), saving_months)
+    corpus = initial_corpus * growth + contributions
+    real_corpus = corpus / (1 + monthly_inflation) ** saving_months
+
+    # Drawdown: a level real withdrawal is an annuity at the real monthly return
+    drawdown_months = (life_expectancy - ages) * 12
+    real_return = (1 + monthly_return) / (1 + monthly_inflation) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity_factor = np.where(
+            np.isclose(real_return, 0), drawdown_months, (1 - (1 + real_return) ** -drawdown_months) / real_return
+        )
+        withdrawal = np.where(drawdown_months > 0, real_corpus / annuity_factor, np.nan)
+        funded_ratio = withdrawal / monthly_expense if monthly_expense else np.full_like(withdrawal, np.nan)
+
+    return {
+        "corpus_at_retirement": corpus,
+        "real_corpus_at_retirement": real_corpus,
+        "sustainable_monthly_withdrawal": withdrawal,
+        "funded_ratio": funded_ratio,
+    }
+
+
+def surface_to_list(array, digits):
+    """JSON-friendly nested lists, with NaN as None"""
+    return np.vectorize(lambda v: None if np.isnan(v) else round(float(v), digits), otypes=[object])(array).tolist()
+
+
+def user_sweep(user):
+    """
+    The user's cached what-if surface, built on a miss.
+
+    Returns (payload, missing input names); the payload is None when the
+    saved profile lacks any of REQUIRED_INPUTS.
+    """
+    inputs = saved_inputs(user)
+    missing = [field for field in REQUIRED_INPUTS if field not in inputs]
+    if missing:
+        return None, missing
+
+    # Retirement ages around the planned one, from next year at the earliest
+    earliest = inputs["current_age"] + 1
+    planned_age = max(inputs["retirement_age"], earliest)
+    span = settings.RETIREMENT_SWEEP_AGE_SPAN
+    axes = {
+        "retirement_ages": list(range(max(earliest, planned_age - span), planned_age + span + 1)),
+        "returns": grid_axis(*settings.RETIREMENT_SWEEP_RETURNS),
+        "inflation": grid_axis(*settings.RETIREMENT_SWEEP_INFLATION),
+    }
+    version = hashlib.sha256(json.dumps({**inputs, **axes}, sort_keys=True).encode()).hexdigest()[:16]
+    cache_key = f"retirement_sweep_{user.id}_{version}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        surface = sweep_surface(
+            current_age=inputs["current_age"],
+            life_expectancy=inputs["life_expectancy"],
+            initial_corpus=inputs["initial_corpus"],
+            monthly_contribution=inputs["monthly_contribution"],
+            monthly_expense=inputs["monthly_expense"],
+            retirement_ages=axes["retirement_ages"],
+            returns=axes["returns"],
+            inflation_rates=axes["inflation"],
+        )
+        payload = {
+            "version": version,
+            "inputs": inputs,
+            **axes,
+            "corpus_at_retirement": surface_to_list(surface["corpus_at_retirement"], 2),
+            "real_corpus_at_retirement": surface_to_list(surface["real_corpus_at_retirement"], 2),
+            "sustainable_monthly_withdrawal": surface_to_list(surface["sustainable_monthly_withdrawal"], 2),
+            "funded_ratio": surface_to_list(surface["funded_ratio"], 4),
+        }
+        cache.set(cache_key, payload, timeout=settings.RETIREMENT_SWEEP_CACHE_TIMEOUT)
+    return payload, []
@@ -23,6 +23,11 @@ from .models import UserData
 from .serializers import UserDataSerializer, UserRegistrationSerializer, UserLoginSerializer
 from .models import LifeExpectancy
 from .serializers import LifeExpectancySerializer
+from .serializers import BreakEvenGridSerializer, RetirementSimulationSerializer
+from .utils.break_even import cached_break_even_grid
+from .utils.scenario_sweep import user_sweep
+from .utils.retirement_simulation import saved_inputs, simulate_retirement
+from django.conf import settings
 
 from config import SITE_URL, FASTAPI_URL
 
@@ -405,4 +410,100 @@ def skip_life_expectancy(request):
         )
         
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ==========================
+# RETIREMENT SIMULATION API
+# ==========================
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def simulate_retirement_corpus(request):
+    """
+    Monte Carlo projection of the user's retirement corpus: yearly percentile
+    bands and the probability of running out of money. Query parameters
+    override the saved profile; pass `seed` to reproduce a run.
+    """
+    serializer = RetirementSimulationSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        overrides = dict(serializer.validated_data)
+        paths = overrides.pop("paths", None)
+        seed = overrides.pop("seed", None)
+        inputs = {
+            "expected_return": settings.RETIREMENT_EXPECTED_RETURN,
+            "volatility": settings.RETIREMENT_VOLATILITY,
+            "post_retirement_return": settings.RETIREMENT_POST_RETURN,
+            "post_retirement_volatility": settings.RETIREMENT_POST_VOLATILITY,
+            **saved_inputs(request.user),
+            **overrides,
+        }
+
+        missing = [
+            field for field in ("current_age", "retirement_age", "initial_corpus", "monthly_contribution", "monthly_expense")
+            if field not in inputs
+        ]
+        if missing:
+            return Response(
+                {"error": "Complete your profile or pass these values", "missing": missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if inputs["retirement_age"] < inputs["current_age"]:
+            return Response(
+                {"error": "retirement_age must not be below current_age"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Rates are echoed back in percent but simulated as fractions
+        simulation_inputs = dict(inputs)
+        for rate in ("expected_return", "volatility", "post_retirement_return", "post_retirement_volatility"):
+            simulation_inputs[rate] /= 100
+        result = simulate_retirement(**simulation_inputs, paths=paths, seed=seed)
+        return Response({**result, "inputs": inputs}, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def calculate_break_even_grid(request):
+    """
+    Annuity vs lump-sum break-even ages for every combination of escalation
+    rate, inflation (rate or path) and annuity rate, for sensitivity tables.
+    Results are indexed [escalation][inflation][annuity rate].
+    """
+    serializer = BreakEvenGridSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        inputs = dict(serializer.validated_data)
+        result = cached_break_even_grid(**inputs)
+        return Response({**result, "inputs": inputs}, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def retirement_scenario_sweep(request):
+    """
+    Corpus at retirement and sustainable monthly withdrawal over a grid of
+    retirement age x expected return x inflation, indexed in that order.
+    The surface is cached until the saved profile changes; `version` changes with it.
+    """
+    try:
+        payload, missing = user_sweep(request.user)
+        if missing:
+            return Response(
+                {"error": "Complete your profile to see retirement scenarios", "missing": missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(payload, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
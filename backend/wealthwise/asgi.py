@@ -3,6 +3,11 @@ ASGI config for wealthwise project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve through an ASGI server (e.g. ``uvicorn wealthwise.asgi:application``)
+so long-lived responses such as the portfolio valuation stream
+(``stocks/valuation/stream/``) wait on the event loop instead of each holding
+a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "allauth.account.middleware.AccountMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "financial_data.middleware.ZerodhaSessionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -182,6 +183,10 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
+        "OPTIONS": {
+            # Quotes and ticker metadata are cached per symbol
+            "MAX_ENTRIES": 10000,
+        },
     }
 }
 
@@ -210,3 +215,120 @@ LOGGING = {
         },
     },
 }
+
+# Market data
+# Number of tickers requested per yfinance bulk download
+MARKET_DATA_BATCH_SIZE = 25
+# Concurrent upstream fetches per request
+MARKET_DATA_MAX_WORKERS = 8
+# Seconds one symbol (or batch) may take once it starts before it is reported as failed
+MARKET_DATA_SYMBOL_TIMEOUT = 15
+# Seconds after which a request returns whatever has been fetched so far
+MARKET_DATA_REQUEST_DEADLINE = 30
+
+# Local daily price store (one memory-mappable file per symbol)
+PRICE_STORE_DIR = os.path.join(BASE_DIR, "price_store")
+# Seconds before a stored symbol is checked upstream for new bars again
+PRICE_STORE_SYNC_INTERVAL = 15 * 60
+
+# Live quote cache
+# Seconds a quote is reused while NSE is open (after close it is kept until the next open)
+QUOTE_CACHE_TTL = 60
+# Seconds a request waits on another request's in-flight fetch of the same symbol
+QUOTE_FETCH_WAIT = 10
+# Exchange holidays (ISO dates) on which NSE does not trade
+NSE_HOLIDAYS = []
+
+# Ticker metadata (yfinance .info) cache
+# Seconds static fields such as name and sector are trusted
+TICKER_STATIC_TTL = 3 * 24 * 60 * 60
+# Seconds an entry is kept at all; stale entries are still served while refreshing
+TICKER_METADATA_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+# Seconds the background refresher idles before sweeping known symbols for stale entries
+TICKER_METADATA_REFRESH_INTERVAL = 5 * 60
+
+# Portfolio analytics
+# Annual risk-free rate used for Sharpe ratios
+RISK_FREE_RATE = 0.065
+# Number of (symbol set, window, as-of date) covariance results memoized per process
+CORRELATION_MEMO_SIZE = 256
+# Value-at-Risk: lookback window in calendar days, confidence levels reported,
+# minimum daily scenarios required and results memoized per process
+VALUE_AT_RISK_LOOKBACK_DAYS = 5 * 365
+VALUE_AT_RISK_CONFIDENCE_LEVELS = (0.95, 0.99)
+VALUE_AT_RISK_MIN_OBSERVATIONS = 60
+VALUE_AT_RISK_MEMO_SIZE = 256
+
+# Zerodha Kite clients (one per access token)
+# Seconds an unused client (and its HTTP connections) is kept before eviction
+KITE_CLIENT_IDLE_TIMEOUT = 30 * 60
+# Keep-alive connections per client
+KITE_HTTP_POOL_SIZE = 4
+# Seconds a user's kite.holdings() snapshot is shared across financial endpoints
+HOLDINGS_CACHE_TTL = 30
+# Seconds a user's ZerodhaUser row (or its absence) is cached for session checks
+ZERODHA_SESSION_CACHE_TTL = 60
+
+# Kite tick stream (live quotes pushed over websocket instead of polled)
+KITE_TICKER_ENABLED = os.getenv("KITE_TICKER_ENABLED", "false").lower() == "true"
+# Websocket endpoint; point at `manage.py replay_ticks` to replay recorded ticks offline
+KITE_TICKER_ROOT = os.getenv("KITE_TICKER_ROOT") or None
+KITE_TICKER_RECONNECT_TRIES = 5
+# Seconds a streamed quote is trusted while NSE is open before falling back to polling
+QUOTE_BOOK_MAX_AGE = 120
+
+# Portfolio valuation stream (server-sent events)
+# Seconds between quote checks on an open stream
+VALUATION_STREAM_INTERVAL = 1
+# Seconds of silence after which a keep-alive comment is sent
+VALUATION_STREAM_HEARTBEAT = 15
+
+# Instrument master (Kite instruments dump)
+# Exchanges whose cash-segment instruments are loaded
+INSTRUMENT_EXCHANGES = ["NSE", "BSE"]
+# Local copy of the dump to load instead of fetching it from Kite
+INSTRUMENTS_CSV = os.getenv("INSTRUMENTS_CSV") or None
+# Seconds between each process's checks for a newer load of the table
+INSTRUMENTS_RELOAD_INTERVAL = 60 * 60
+
+# Market-cap classification (cap buckets for risk scoring)
+# Seconds after which the stored ranking is stale (build_cap_index runs daily); processes keep using it with a warning
+CAP_INDEX_REBUILD_INTERVAL = 24 * 60 * 60
+# Seconds each process keeps the stored ranking before re-reading the table
+CAP_INDEX_RELOAD_INTERVAL = 60 * 60
+# Seconds between re-reads of the table while no ranking is stored
+CAP_INDEX_RETRY_INTERVAL = 5 * 60
+# Share of the universe that needs a market cap before the ranking replaces stocks_list
+CAP_INDEX_MIN_COVERAGE = 0.9
+# Largest number of portfolios accepted by one risk/batch/ request
+RISK_BATCH_MAX_PORTFOLIOS = 10000
+
+# Retirement simulation (Monte Carlo)
+# Monthly CPI inflation history the inflation model is fitted to
+INFLATION_DATA_PATH = os.path.join(BASE_DIR, "users", "data", "inflation_data.json")
+# Paths simulated by default, the most one request may ask for, and paths per vectorized chunk
+RETIREMENT_SIMULATION_PATHS = 10000
+RETIREMENT_SIMULATION_MAX_PATHS = 50000
+RETIREMENT_SIMULATION_CHUNK = 2000
+# Default annual expected return and volatility (percent) before and after retirement
+RETIREMENT_EXPECTED_RETURN = 10
+RETIREMENT_VOLATILITY = 15
+RETIREMENT_POST_RETURN = 7
+RETIREMENT_POST_VOLATILITY = 6
+# Life expectancy assumed when the user skipped the life expectancy form
+RETIREMENT_DEFAULT_LIFE_EXPECTANCY = 72
+
+# Annuity vs lump-sum break-even grid
+# Most (escalation x inflation x annuity rate) scenarios one request may ask for
+BREAK_EVEN_MAX_SCENARIOS = 10000
+# Seconds a computed grid is cached (results depend only on the inputs)
+BREAK_EVEN_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Retirement what-if surface (retirement age x return x inflation)
+# Years either side of the planned retirement age
+RETIREMENT_SWEEP_AGE_SPAN = 10
+# (first, last, step) of the expected return and inflation axes, percent
+RETIREMENT_SWEEP_RETURNS = (4, 14, 0.5)
+RETIREMENT_SWEEP_INFLATION = (2, 10, 0.5)
+# Seconds a surface is cached; a profile change builds a new one regardless
+RETIREMENT_SWEEP_CACHE_TIMEOUT = 24 * 60 * 60